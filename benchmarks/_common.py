@@ -0,0 +1,25 @@
+"""Helpers shared by the benchmark and check scripts"""
+import logging
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_app(data_dir=None, **settings):
+    """Import checklistv1 with its files going to data_dir
+
+    settings are CHECKLIST_* environment variables without the prefix, e.g.
+    import_app(data_dir, storage="sqlite") sets CHECKLIST_STORAGE. They must be
+    set before the first import, which reads them.
+    """
+    if data_dir is not None:
+        os.chdir(data_dir)
+    for name, value in settings.items():
+        os.environ[f"CHECKLIST_{name.upper()}"] = str(value)
+    # Importing outside `streamlit run` logs bare-mode warnings for every st call
+    logging.disable(logging.WARNING)
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    import checklistv1
+    return checklistv1
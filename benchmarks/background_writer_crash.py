@@ -0,0 +1,266 @@
+"""Crash and failure checks for the background writer (CHECKLIST_ASYNC_WRITES=1).
+
+crash    A child process queues toggles through a slowed-down writer and is
+         SIGKILLed part way through. A new writer then replays the journal;
+         every toggle must be logged exactly once and the final state must
+         match the last toggle of each task.
+retry    Storage that fails the first few appends; every write must still land
+         and no error may be reported.
+failure  Storage that always fails; the error must be reported for the person,
+         the write must stay journaled, and a later writer must replay it.
+group    Threads submitting at once; every submit must return only after the
+         journal was fsynced, and concurrent submits must share fsyncs.
+
+    python benchmarks/background_writer_crash.py --rounds 5 --toggles 200
+    python benchmarks/background_writer_crash.py --storage sqlite
+
+Exits non-zero if any check fails.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import signal
+import sys
+import tempfile
+import threading
+import time
+
+from _common import import_app
+
+PERSON = "Crash"
+TASKS = 8
+
+
+class SlowStorage:
+    """Delays every write so a kill lands between and inside queued writes"""
+
+    def __init__(self, storage, delay):
+        self._storage = storage
+        self._delay = delay
+
+    def __getattr__(self, name):
+        return getattr(self._storage, name)
+
+    def append_log_many(self, person, log_entries):
+        time.sleep(self._delay)
+        self._storage.append_log_many(person, log_entries)
+
+    def update_state(self, person, state, changes):
+        time.sleep(self._delay)
+        return self._storage.update_state(person, state, changes)
+
+
+class FlakyStorage:
+    """Fails the first `failures` appends, or all of them when failures is None"""
+
+    def __init__(self, storage, failures):
+        self._storage = storage
+        self._failures = failures
+
+    def __getattr__(self, name):
+        return getattr(self._storage, name)
+
+    def append_log_many(self, person, log_entries):
+        if self._failures is None or self._failures > 0:
+            if self._failures is not None:
+                self._failures -= 1
+            raise OSError("simulated disk failure")
+        self._storage.append_log_many(person, log_entries)
+
+
+def make_write(app, i):
+    """The write queue_task_changes() would submit for toggle i"""
+    today = app.get_today_key()
+    key = f"Crash_k{i % TASKS}"
+    completed = (i // TASKS) % 2 == 0
+    timestamp = f"{today}T12:00:00.{i:06d}"
+    state = {'date': today, 'completed_tasks': {}, 'completion_times': {}}
+    return {
+        'person': PERSON,
+        'date': today,
+        'log_entries': [app.make_log_entry(PERSON, key, f"toggle_{i}", 1, completed, timestamp)],
+        'state': state,
+        'changes': {key: (completed, timestamp if completed else None)}
+    }
+
+
+def expected_state(toggles):
+    final = {}
+    for i in range(toggles):
+        final[f"Crash_k{i % TASKS}"] = (i // TASKS) % 2 == 0
+    return final
+
+
+def run_child(data_dir, storage, toggles, delay, submitted):
+    app = import_app(data_dir, storage=storage, async_writes=1)
+    writer = app.BackgroundWriter(SlowStorage(app.get_storage(), delay))
+    for i in range(toggles):
+        writer.submit(make_write(app, i))
+    submitted.set()
+    writer.flush()
+
+
+def verify(app, toggles):
+    """Return a list of problems found in the log and state on disk"""
+    problems = []
+    seen = {}
+    for log_entry in app.get_storage().iter_log(PERSON):
+        seen[log_entry['task']] = seen.get(log_entry['task'], 0) + 1
+    for i in range(toggles):
+        count = seen.get(f"toggle_{i}", 0)
+        if count != 1:
+            problems.append(f"log entry toggle_{i} found {count} times")
+
+    state = app.get_storage().load_state(PERSON) or {'completed_tasks': {}}
+    for key, completed in expected_state(toggles).items():
+        if state['completed_tasks'].get(key) != completed:
+            problems.append(f"state for {key} is {state['completed_tasks'].get(key)}, expected {completed}")
+    return problems
+
+
+def check_crash(storage, rounds, toggles, delay):
+    problems = []
+    context = multiprocessing.get_context("spawn")
+    for round_number in range(rounds):
+        data_dir = tempfile.mkdtemp(prefix="checklist_crash_")
+        submitted = context.Event()
+        child = context.Process(target=run_child, args=(data_dir, storage, toggles, delay, submitted))
+        child.start()
+        if not submitted.wait(60):
+            child.kill()
+            problems.append(f"round {round_number}: child never finished submitting")
+            continue
+        # Somewhere between a few and most of the queued writes
+        time.sleep(random.uniform(0.05, 0.8) * toggles * delay * 2)
+        os.kill(child.pid, signal.SIGKILL)
+        child.join()
+
+        # Recovery happens in a fresh process, as after a real restart
+        with context.Pool(1) as pool:
+            written, round_problems = pool.apply(recover_and_verify, (data_dir, storage, toggles))
+        print(f"crash round {round_number}: killed with {written} of {toggles} log entries written, "
+              f"{len(round_problems)} problem(s) after recovery")
+        problems.extend(f"round {round_number}: {problem}" for problem in round_problems)
+    return problems
+
+
+def recover_and_verify(data_dir, storage, toggles):
+    app = import_app(data_dir, storage=storage, async_writes=1)
+    written = sum(1 for _ in app.get_storage().iter_log(PERSON))
+    writer = app.BackgroundWriter(app.get_storage())
+    writer.flush()
+    problems = verify(app, toggles)
+    problems.extend(f"recovery error: {error}" for error in writer.take_errors(PERSON))
+    writer.close()
+    leftover = [name for name in os.listdir(data_dir) if name.startswith(app.WRITE_JOURNAL_PREFIX)]
+    if leftover:
+        problems.append(f"journals left behind: {leftover}")
+    return written, problems
+
+
+def check_retry(app, toggles):
+    app.WRITE_RETRY_DELAY_SECONDS = 0.01
+    writer = app.BackgroundWriter(FlakyStorage(app.get_storage(), failures=app.WRITE_RETRIES - 1))
+    for i in range(toggles):
+        writer.submit(make_write(app, i))
+    writer.flush()
+    problems = verify(app, toggles)
+    problems.extend(f"unexpected error: {error}" for error in writer.take_errors(PERSON))
+    writer.close()
+    return problems
+
+
+def check_failure(app, toggles):
+    app.WRITE_RETRY_DELAY_SECONDS = 0.01
+    problems = []
+    writer = app.BackgroundWriter(FlakyStorage(app.get_storage(), failures=None))
+    writer.submit(make_write(app, toggles))
+    writer.flush()
+    errors = writer.take_errors(PERSON)
+    if len(errors) != 1:
+        problems.append(f"expected 1 reported error, got {errors}")
+    writer.close()
+    if not os.path.exists(writer.journal_file):
+        problems.append("failed write was dropped from the journal")
+
+    # The next writer to start owes that write
+    writer = app.BackgroundWriter(app.get_storage())
+    problems.extend(verify(app, toggles + 1))
+    writer.close()
+    return problems
+
+
+def check_group(storage, threads, toggles):
+    # A fresh process, so the log starts empty
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        return pool.apply(group_submits, (tempfile.mkdtemp(prefix="checklist_group_"), storage, threads, toggles))
+
+
+def group_submits(data_dir, storage, threads, toggles):
+    app = import_app(data_dir, storage=storage, async_writes=1)
+    problems = []
+    fsync = os.fsync
+    calls = []
+
+    def counting_fsync(fd):
+        fsync(fd)
+        calls.append(fd)
+
+    app.os.fsync = counting_fsync
+    try:
+        writer = app.BackgroundWriter(SlowStorage(app.get_storage(), 0.001))
+
+        def submit_range(start):
+            for i in range(start, toggles, threads):
+                before = writer._journaled
+                writer.submit(make_write(app, i))
+                if writer._synced <= before:
+                    problems.append(f"toggle {i} acknowledged before its journal line was fsynced")
+
+        workers = [threading.Thread(target=submit_range, args=(t,)) for t in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        writer.flush()
+        syncs = sum(1 for fd in calls if fd == writer._journal)
+        writer.close()
+    finally:
+        app.os.fsync = fsync
+    print(f"group: {toggles} submits from {threads} threads, {syncs} journal fsyncs")
+    if not 0 < syncs <= toggles:
+        problems.append(f"{syncs} journal fsyncs for {toggles} submits")
+    problems.extend(verify(app, toggles))
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=5, help="crash rounds")
+    parser.add_argument("--toggles", type=int, default=200)
+    parser.add_argument("--delay", type=float, default=0.002, help="seconds added to each storage write in crash rounds")
+    parser.add_argument("--storage", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--threads", type=int, default=8, help="concurrent submitters in the group check")
+    args = parser.parse_args()
+
+    results = {"crash": check_crash(args.storage, args.rounds, args.toggles, args.delay)}
+
+    data_dir = tempfile.mkdtemp(prefix="checklist_writer_")
+    app = import_app(data_dir, storage=args.storage, async_writes=1)
+    results["retry"] = check_retry(app, args.toggles)
+    results["failure"] = check_failure(app, args.toggles)
+    results["group"] = check_group(args.storage, args.threads, args.toggles)
+
+    failed = False
+    for check, problems in results.items():
+        for problem in problems[:20]:
+            print(f"FAIL {check}: {problem}")
+        print(f"{check}: {'OK' if not problems else f'{len(problems)} problem(s)'}")
+        failed = failed or bool(problems)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
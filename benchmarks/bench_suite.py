@@ -0,0 +1,247 @@
+"""Headless performance benchmarks for the checklist app.
+
+For every combination of synthetic log size and number of people, a fresh data
+directory is filled with history and then measured:
+
+  toggle          log_completion() + update_checklist_state(), as a checkbox click does
+  save_state      save_checklist_state()
+  load_state      load_checklist_state()
+  export          generate_combined_log_csv() over the whole history (rows/s)
+  archive         archive_log() for every person, copying the history into Parquet
+  archive_export  generate_log_parquet() over the whole history (rows/s), reading
+                  the archive memory-mapped
+  ledger_rebuild  rebuild_rollups() for one person and loading their ticket ledger,
+                  both from the full log
+  ledger_query    a lifetime balance plus a tickets-between-dates lookup
+  rerun           a full AppTest run of the app, and a rerun of the same session
+
+Each measurement records wall time and, from one extra traced call, peak Python
+memory (tracemalloc). tracemalloc does not see memory Arrow allocates itself,
+so the archive and archive_export peaks understate what those steps use.
+
+    python benchmarks/bench_suite.py
+    python benchmarks/bench_suite.py --log-sizes 1000 1000000 --people 2 500 --storage sqlite
+    python benchmarks/bench_suite.py --output bench.json
+
+The output is one JSON document (with the git commit it ran against) so results
+from different commits can be compared with a diff or a small script.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from _common import REPO_ROOT, import_app
+
+RERUN_SCRIPT = """
+import sys
+sys.path.insert(0, {repo_root!r})
+import checklistv1
+checklistv1.main()
+"""
+
+
+def timed(func, repeat=1, setup=None):
+    """Run func repeat times untraced, then once under tracemalloc
+
+    Returns (timings in ms, peak memory in KiB, last result). Timing and memory
+    are taken separately because tracemalloc slows allocation-heavy code a lot.
+    setup, if given, runs untimed and untraced before every call.
+    """
+    timings = []
+    result = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return timings, peak / 1024, result
+
+
+def summarize(timings, peak_kib, **extra):
+    timings = sorted(timings)
+    return {
+        'runs': len(timings),
+        'mean_ms': round(statistics.mean(timings), 3),
+        'p50_ms': round(timings[len(timings) // 2], 3),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+        'peak_kib': round(peak_kib, 1),
+        **extra,
+    }
+
+
+def populate(app, people, log_size):
+    """Spread log_size synthetic entries over people and the days before today"""
+    registry = app.get_task_registry()
+    storage = app.get_storage()
+    per_person = max(1, log_size // len(people))
+    start_day = datetime.now() - timedelta(days=per_person // len(registry.tasks) + 1)
+
+    for person in people:
+        batch = []
+        for i in range(per_person):
+            task = registry.tasks[i % len(registry.tasks)]
+            when = start_day + timedelta(days=i // len(registry.tasks), seconds=i % len(registry.tasks))
+            batch.append({
+                'person': person,
+                'date': when.strftime("%Y-%m-%d"),
+                'timestamp': when.isoformat(),
+                'task': task.name,
+                'tickets': task.tickets,
+                'completed': True,
+                'task_key': task.key,
+            })
+            if len(batch) == 10000:
+                storage.append_log_many(person, batch)
+                batch = []
+        if batch:
+            storage.append_log_many(person, batch)
+        app.save_checklist_state(person, app.create_fresh_checklist())
+
+
+def run_case(app, people_count, log_size, toggles):
+    people = [f"Bench{i:03d}" for i in range(people_count)]
+    populate(app, people, log_size)
+    person = people[0]
+    registry = app.get_task_registry()
+    state = app.load_checklist_state(person)
+    results = {}
+
+    def toggle():
+        toggle.count += 1
+        task = registry.tasks[toggle.count % len(registry.tasks)]
+        completed = not state['completed_tasks'].get(task.key, False)
+        timestamp = datetime.now().isoformat()
+        state['completed_tasks'][task.key] = completed
+        state['completion_times'][task.key] = timestamp if completed else None
+        app.log_completion(person, task.key, task.name, task.tickets, completed, timestamp)
+        app.update_checklist_state(person, state, {task.key: (completed, state['completion_times'][task.key])})
+    toggle.count = 0
+
+    results['toggle'] = summarize(*timed(toggle, toggles)[:2])
+    results['save_state'] = summarize(*timed(lambda: app.save_checklist_state(person, state), toggles)[:2])
+    results['load_state'] = summarize(*timed(lambda: app.load_checklist_state(person), toggles)[:2])
+
+    def export():
+        csv_file = app.generate_combined_log_csv(people)
+        if isinstance(csv_file, str):
+            raise RuntimeError(csv_file)
+        size = os.fstat(csv_file.fileno()).st_size
+        csv_file.close()
+        return size
+
+    timings, peak, csv_bytes = timed(export)
+    rows = people_count * max(1, log_size // people_count) + toggles
+    results['export'] = summarize(
+        timings, peak, rows=rows, csv_bytes=csv_bytes,
+        rows_per_s=round(rows / (timings[0] / 1000))
+    )
+
+    # Every call, the traced one included, archives the whole history from scratch
+    archive_root = os.path.join(app.get_storage().data_dir, app.ARCHIVE_DIR)
+    timings, peak, _ = timed(
+        lambda: [app.archive_log(p) for p in people],
+        setup=lambda: shutil.rmtree(archive_root, ignore_errors=True)
+    )
+    results['archive'] = summarize(timings, peak)
+
+    def archive_export():
+        parquet_file = app.generate_log_parquet(people)
+        if isinstance(parquet_file, str):
+            raise RuntimeError(parquet_file)
+        size = os.fstat(parquet_file.fileno()).st_size
+        parquet_file.close()
+        return size
+
+    timings, peak, parquet_bytes = timed(archive_export)
+    results['archive_export'] = summarize(
+        timings, peak, rows=rows, parquet_bytes=parquet_bytes,
+        rows_per_s=round(rows / (timings[0] / 1000))
+    )
+
+    ledger = app.get_ticket_ledger()
+    first_date = min(app.get_daily_rollups().days(person, registry))
+    results['ledger_rebuild'] = summarize(*timed(
+        lambda: (app.rebuild_rollups([person]), ledger.balance(person, registry))
+    )[:2])
+    results['ledger_query'] = summarize(*timed(
+        lambda: (ledger.balance(person, registry), ledger.between(person, first_date, app.get_today_key(), registry)),
+        toggles
+    )[:2])
+
+    from streamlit.testing.v1 import AppTest
+    with open(app.CONFIG_FILE, 'w') as f:
+        json.dump({'people': people}, f)
+    app_test = AppTest.from_string(RERUN_SCRIPT.format(repo_root=REPO_ROOT), default_timeout=300)
+    timings, peak, _ = timed(app_test.run)
+    if app_test.exception:
+        raise RuntimeError(app_test.exception[0].message)
+    results['first_run'] = summarize(timings, peak)
+    results['rerun'] = summarize(*timed(app_test.run, 5)[:2])
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--log-sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("--people", type=int, nargs="+", default=[2, 50, 500])
+    parser.add_argument("--toggles", type=int, default=50, help="samples for the per-call timings")
+    parser.add_argument("--storage", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = {
+        'commit': git_commit(),
+        'started': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'storage': args.storage,
+        'cases': [],
+    }
+    for people_count in args.people:
+        for log_size in args.log_sizes:
+            # Each case gets its own data directory and fresh storage, rollups and ledger
+            app = import_app(tempfile.mkdtemp(prefix="checklist_bench_"), storage=args.storage)
+            app.open_household.clear()
+            print(f"people={people_count} log_size={log_size} ...", file=sys.stderr)
+            report['cases'].append({
+                'people': people_count,
+                'log_size': log_size,
+                'results': run_case(app, people_count, log_size, args.toggles),
+            })
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Per-click server time of the checklist page.
+
+Each click on a checkbox is timed with Streamlit's AppTest harness, in a fresh
+data directory, in one of two modes:
+
+  full      the whole script runs for each click (what every click cost before
+            the checklist moved into a fragment, and what it still costs on
+            Streamlit versions without st.fragment)
+  fragment  only render_checklist_body() runs for each click, which is what a
+            click inside the fragment costs in a live app
+
+    python benchmarks/click_latency.py --mode full --mode fragment --clicks 40
+    python benchmarks/click_latency.py --app /path/to/older/checklistv1.py --mode full
+
+Prints one JSON object per mode.
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+from _common import REPO_ROOT
+
+FRAGMENT_SCRIPT = """
+import sys
+sys.path.insert(0, {app_dir!r})
+import checklistv1
+checklistv1.render_checklist_body({person!r}, {{}})
+"""
+
+
+def measure(mode, app_file, clicks, person):
+    from streamlit.testing.v1 import AppTest
+
+    os.chdir(tempfile.mkdtemp(prefix="checklist_clicks_"))
+    if mode == "full":
+        app = AppTest.from_file(app_file, default_timeout=60)
+    else:
+        script = FRAGMENT_SCRIPT.format(app_dir=os.path.dirname(app_file), person=person)
+        app = AppTest.from_string(script, default_timeout=60)
+    app.run()
+
+    timings = []
+    for i in range(clicks):
+        checkbox = app.checkbox[i % len(app.checkbox)]
+        checkbox.uncheck() if checkbox.value else checkbox.check()
+        start = time.perf_counter()
+        app.run()
+        timings.append((time.perf_counter() - start) * 1000)
+        if app.exception:
+            raise RuntimeError(app.exception[0].message)
+
+    timings.sort()
+    return {
+        'mode': mode,
+        'app': app_file,
+        'clicks': clicks,
+        'mean_ms': round(statistics.mean(timings), 2),
+        'p50_ms': round(timings[len(timings) // 2], 2),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--app", default=os.path.join(REPO_ROOT, "checklistv1.py"))
+    parser.add_argument("--mode", action="append", choices=["full", "fragment"])
+    parser.add_argument("--clicks", type=int, default=40)
+    parser.add_argument("--person", default="Jonathan")
+    args = parser.parse_args()
+
+    # AppTest logs a bare-mode warning for every st call made outside a session
+    logging.disable(logging.WARNING)
+    for mode in args.mode or ["full", "fragment"]:
+        print(json.dumps(measure(mode, os.path.abspath(args.app), args.clicks, args.person)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""Checks for the completion-email outbox against a local debugging SMTP server.
+
+deliver   Ticking every task in the app queues exactly one email, with the
+          day's CSV attached by the worker, and it reaches the server.
+pooling   Many emails queued in several households' outboxes go out over a
+          single SMTP connection, from one worker.
+retry     Mail queued while the server is down is delivered once it comes up.
+restart   Mail left in the outbox by a stopped worker is sent by the next one.
+missing   A queued key whose file another process already sent does not stop
+          the worker; mail queued after it is still delivered.
+
+    python benchmarks/email_outbox.py
+    python benchmarks/email_outbox.py --serve 8025
+
+With --serve it only runs the debugging server and prints every message it
+receives, for trying the app by hand:
+
+    CHECKLIST_SMTP_HOST=localhost CHECKLIST_SMTP_PORT=8025 \\
+    CHECKLIST_EMAIL_TO=parent@example.com streamlit run checklistv1.py
+
+Exits non-zero if any check fails.
+"""
+import argparse
+import email
+import email.policy
+import os
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+from email.message import EmailMessage
+
+from _common import REPO_ROOT, import_app
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib: HELO/EHLO, MAIL, RCPT, DATA, RSET, NOOP, QUIT"""
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode("ascii"))
+
+    def handle(self):
+        with self.server.lock:
+            self.server.connections += 1
+        self.reply("220 localhost checklist debugging server")
+        recipients = []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            verb = line[:4].decode("ascii", "replace").upper()
+            if verb in ("HELO", "EHLO"):
+                self.reply("250 localhost")
+            elif verb == "MAIL":
+                recipients = []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                recipients.append(line[8:].decode().strip())
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                for data_line in iter(self.rfile.readline, b""):
+                    if data_line in (b".\r\n", b".\n"):
+                        break
+                    lines.append(data_line[1:] if data_line.startswith(b"..") else data_line)
+                message = email.message_from_bytes(b"".join(lines), policy=email.policy.default)
+                with self.server.lock:
+                    self.server.messages.append((recipients, message))
+                if self.server.verbose:
+                    print(f"--- message to {', '.join(recipients)} ---\n{message}", flush=True)
+                self.reply("250 OK")
+            elif verb in ("RSET", "NOOP"):
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, port, verbose=False):
+        super().__init__(("127.0.0.1", port), SMTPHandler)
+        self.lock = threading.Lock()
+        self.messages = []
+        self.connections = 0
+        self.verbose = verbose
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def open_outbox(app, port, outbox_dir=None, worker=None):
+    """An outbox in outbox_dir (a new temporary one by default) with its own worker unless one is given"""
+    worker = worker or app.OutboxWorker("127.0.0.1", port)
+    return app.EmailOutbox(worker, outbox_dir or tempfile.mkdtemp(prefix="outbox_"))
+
+
+def make_message(i):
+    message = EmailMessage()
+    message["Subject"] = f"test {i}"
+    message["From"] = "checklist@localhost"
+    message["To"] = "parent@example.com"
+    message.set_content(f"message {i}")
+    return message
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def check_deliver(app, port):
+    from streamlit.testing.v1 import AppTest
+
+    sink = SMTPSink(port).start()
+    try:
+        app_test = AppTest.from_file(os.path.join(REPO_ROOT, "checklistv1.py"), default_timeout=60)
+        app_test.run()
+        toggles = len(app_test.checkbox)
+        for i in range(toggles):
+            app_test.checkbox[i].check().run()
+        # A few more reruns of the completed list must not queue it again
+        app_test.run()
+        app_test.run()
+        if app_test.exception:
+            return [f"app raised {app_test.exception[0].message}"]
+
+        wait_for(lambda: sink.messages)
+        time.sleep(0.5)
+        problems = []
+        if len(sink.messages) != 1:
+            problems.append(f"expected 1 email, got {len(sink.messages)}")
+        else:
+            _, message = sink.messages[0]
+            attachments = list(message.iter_attachments())
+            if len(attachments) != 1 or not attachments[0].get_filename().endswith(".csv"):
+                problems.append(f"expected one CSV attachment, got {[part.get_filename() for part in attachments]}")
+            elif len(attachments[0].get_content().splitlines()) != toggles + 1:
+                problems.append(f"expected the CSV to hold {toggles} toggles")
+            if message[app.COMPLETION_LOG_HEADER] is not None:
+                problems.append(f"{app.COMPLETION_LOG_HEADER} was sent along")
+        return problems
+    finally:
+        sink.shutdown()
+        sink.server_close()
+
+
+def check_pooling(app, port, count):
+    sink = SMTPSink(port).start()
+    try:
+        first = open_outbox(app, port)
+        outboxes = [first] + [open_outbox(app, port, worker=first.worker) for _ in range(3)]
+        for i in range(count):
+            outboxes[i % len(outboxes)].enqueue(f"pool_{i}", make_message(i))
+        first.enqueue("pool_0", make_message(0))
+        for outbox in outboxes:
+            outbox.flush()
+        problems = []
+        if len(sink.messages) != count:
+            problems.append(f"expected {count} emails, got {len(sink.messages)}")
+        if sink.connections != 1:
+            problems.append(f"expected 1 SMTP connection, got {sink.connections}")
+        return problems
+    finally:
+        sink.shutdown()
+        sink.server_close()
+
+
+def check_retry(app, port):
+    outbox = open_outbox(app, port)
+    outbox.enqueue("retry", make_message("retry"))
+    # The first attempts fail while nothing listens on the port
+    time.sleep(0.2)
+    sink = SMTPSink(port).start()
+    try:
+        outbox.flush()
+        problems = []
+        if len(sink.messages) != 1:
+            problems.append(f"expected the email after the server came up, got {len(sink.messages)}")
+        if not outbox.is_sent("retry"):
+            problems.append("email was not moved to sent/")
+        return problems
+    finally:
+        sink.shutdown()
+        sink.server_close()
+
+
+def check_restart(app, port):
+    outbox_dir = tempfile.mkdtemp(prefix="outbox_")
+    # Written the way enqueue() saves it, but never picked up by a worker
+    with open(os.path.join(outbox_dir, "left_over.eml"), "w") as f:
+        f.write(make_message("left over").as_string())
+
+    sink = SMTPSink(port).start()
+    try:
+        outbox = open_outbox(app, port, outbox_dir)
+        outbox.flush()
+        if len(sink.messages) != 1 or not outbox.is_sent("left_over"):
+            return [f"left-over email not delivered ({len(sink.messages)} received)"]
+        return []
+    finally:
+        sink.shutdown()
+        sink.server_close()
+
+
+def check_missing(app, port):
+    sink = SMTPSink(port).start()
+    try:
+        outbox = open_outbox(app, port)
+        # Queued here, but its .eml was moved to sent/ by another server process
+        outbox.worker.put(outbox, "sent_elsewhere")
+        outbox.enqueue("after", make_message("after"))
+        # Not flush(): it never returns if the worker died
+        wait_for(lambda: outbox.is_sent("after"))
+        problems = []
+        if not outbox.worker._thread.is_alive():
+            problems.append("the worker thread died")
+        if len(sink.messages) != 1 or not outbox.is_sent("after"):
+            problems.append(f"mail queued after the missing key was not delivered ({len(sink.messages)} received)")
+        return problems
+    finally:
+        sink.shutdown()
+        sink.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--serve", type=int, metavar="PORT", help="only run the debugging server")
+    parser.add_argument("--emails", type=int, default=50, help="emails sent in the pooling check")
+    args = parser.parse_args()
+
+    if args.serve:
+        print(f"Debugging SMTP server on 127.0.0.1:{args.serve}", flush=True)
+        SMTPSink(args.serve, verbose=True).serve_forever()
+        return
+
+    port = free_port()
+    app = import_app(tempfile.mkdtemp(prefix="checklist_email_"), smtp_host="127.0.0.1", smtp_port=port,
+                     email_to="parent@example.com")
+    app.EMAIL_RETRY_DELAY_SECONDS = 0.05
+    results = {
+        "deliver": check_deliver(app, port),
+        "pooling": check_pooling(app, port, args.emails),
+        "retry": check_retry(app, port),
+        "restart": check_restart(app, port),
+        "missing": check_missing(app, port),
+    }
+
+    failed = False
+    for check, problems in results.items():
+        for problem in problems:
+            print(f"FAIL {check}: {problem}")
+        print(f"{check}: {'OK' if not problems else f'{len(problems)} problem(s)'}")
+        failed = failed or bool(problems)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
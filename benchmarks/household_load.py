@@ -0,0 +1,273 @@
+"""Load test: one server process serving many households at once.
+
+Starts `streamlit run checklistv1.py` with CHECKLIST_DATA_ROOT set and opens
+--sessions websocket sessions for each of --households households, all
+connected at the same time and selecting their household with ?household=.
+The sessions of a household tick different tasks of the same person; household
+h ticks 3 + h % 18 tasks in all, so every household ends with a different count.
+Session 0 then un-ticks the first task again.
+
+After the server stops, each household's shard is read with the app's own
+storage and checked:
+
+isolation   the shard holds exactly its own household's ticks, and nothing
+            was written outside <root>/households/ or to the server's cwd
+log         every toggle was logged exactly once, none lost or duplicated
+unknown     a ?household= id with no directory is refused: it shows no
+            checklist and creates nothing
+
+The households' directories are created up front, as an operator would.
+
+Every session loads the page first; the toggles then run in all sessions at
+once. Reports first-load and toggle latencies, toggle throughput and the
+server's memory and thread count at the end.
+
+    python benchmarks/household_load.py --households 50 --sessions 2
+    python benchmarks/household_load.py --storage sqlite --async-writes
+
+Exits non-zero if any check fails.
+"""
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from time import perf_counter
+
+from _common import REPO_ROOT, import_app
+
+PERSON = "Jonathan"
+UNKNOWN_HOUSEHOLD = "nobody-lives-here"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, data_root, storage, async_writes):
+    """Run the app headless on port, from an empty working directory"""
+    env = dict(
+        os.environ,
+        CHECKLIST_DATA_ROOT=data_root,
+        CHECKLIST_STORAGE=storage,
+        CHECKLIST_ASYNC_WRITES="1" if async_writes else "0",
+    )
+    cwd = tempfile.mkdtemp(prefix="checklist_server_")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", os.path.join(REPO_ROOT, "checklistv1.py"),
+         "--server.headless", "true", "--server.port", str(port), "--server.fileWatcherType", "none",
+         "--browser.gatherUsageStats", "false"],
+        cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1):
+                return server, cwd
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("server did not come up")
+
+
+def server_status(pid):
+    """(RSS in MiB, thread count) of a process, from /proc where there is one"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+    except OSError:
+        return None, None
+    return int(fields["VmRSS"].split()[0]) / 1024, int(fields["Threads"])
+
+
+class Session:
+    """A browser tab: sends reruns with its widget values and reads back the checkboxes"""
+
+    def __init__(self, conn, query_string):
+        self.conn = conn
+        self.query_string = query_string
+        self.widget_states = {}
+        # key -> (widget id, id of the fragment it is drawn in)
+        self.checkboxes = {}
+
+    async def rerun(self, fragment_id=""):
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        message = BackMsg()
+        message.rerun_script.query_string = self.query_string
+        message.rerun_script.widget_states.widgets.extend(self.widget_states.values())
+        message.rerun_script.fragment_id = fragment_id
+        await self.conn.send(message.SerializeToString())
+        while True:
+            forward = ForwardMsg()
+            forward.ParseFromString(await self.conn.recv())
+            kind = forward.WhichOneof("type")
+            if kind == "delta" and forward.delta.WhichOneof("type") == "new_element":
+                element = forward.delta.new_element
+                if element.WhichOneof("type") == "checkbox":
+                    # Widget ids are "$$ID-<hash>-<key>"
+                    key = element.checkbox.id.split("-", 2)[2]
+                    self.checkboxes[key] = (element.checkbox.id, forward.delta.fragment_id)
+            elif kind == "script_finished":
+                return
+
+    async def toggle(self, key, value):
+        """Click a checkbox; like the browser, only its fragment reruns"""
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        widget_id, fragment_id = self.checkboxes[f"checkbox_{PERSON}_{key}"]
+        self.widget_states[widget_id] = WidgetState(id=widget_id, bool_value=value)
+        await self.rerun(fragment_id)
+
+
+def household_plan(household_index, task_keys, sessions):
+    """Each session's (task key, value) toggles, and the task keys left done"""
+    ticked = task_keys[:3 + household_index % 18]
+    plans = [[(key, True) for key in ticked[s::sessions]] for s in range(sessions)]
+    plans[0].append((ticked[0], False))
+    return plans, set(ticked[1:])
+
+
+async def open_session(port, household, results):
+    from websockets.asyncio.client import connect
+
+    conn = await connect(f"ws://127.0.0.1:{port}/_stcore/stream", subprotocols=["streamlit"], max_size=None)
+    session = Session(conn, f"household={household}")
+    start = perf_counter()
+    await session.rerun()
+    results['load'].append(perf_counter() - start)
+    return session
+
+
+async def run_session(session, plan, results):
+    for key, value in plan:
+        start = perf_counter()
+        await session.toggle(key, value)
+        results['toggle'].append(perf_counter() - start)
+    await session.conn.close()
+
+
+async def run_households(port, households, plans):
+    """Open every session, then toggle in all of them at once; returns latencies and the toggle phase's length"""
+    results = {'load': [], 'toggle': []}
+    runs = [(household, plan) for household in households for plan in plans[household]]
+    sessions = await asyncio.gather(*(open_session(port, household, results) for household, _ in runs))
+    fragments = {fragment_id for session in sessions for _, fragment_id in session.checkboxes.values()}
+    if "" in fragments:
+        print("note: some checkboxes are not in a fragment, so their toggles rerun the whole page")
+    start = perf_counter()
+    await asyncio.gather(*(run_session(session, plan, results) for session, (_, plan) in zip(sessions, runs)))
+    return results, perf_counter() - start
+
+
+async def probe_household(port, household):
+    """Load the page for household once; returns the checkboxes it showed"""
+    from websockets.asyncio.client import connect
+
+    async with connect(f"ws://127.0.0.1:{port}/_stcore/stream", subprotocols=["streamlit"], max_size=None) as conn:
+        session = Session(conn, f"household={household}")
+        await session.rerun()
+    return session.checkboxes
+
+
+def verify(app, storage_name, households, expected, toggles):
+    """Return (isolation problems, log problems) found in the shards on disk"""
+    isolation, log = [], []
+    for household in households:
+        storage = app.open_storage(storage_name, app.get_household_dir(household))
+        state = storage.load_state(PERSON) or {'completed_tasks': {}}
+        done = {key for key, completed in state['completed_tasks'].items() if completed}
+        if done != expected[household]:
+            isolation.append(f"{household}: {len(done)} tasks done, expected {len(expected[household])}")
+        for other in app.PEOPLE:
+            other_state = other != PERSON and storage.load_state(other)
+            if other_state and any(other_state['completed_tasks'].values()):
+                isolation.append(f"{household}: {other} has ticks nobody made")
+
+        logged = {}
+        for log_entry in storage.iter_log(PERSON):
+            toggle = (log_entry['task_key'], log_entry['completed'])
+            logged[toggle] = logged.get(toggle, 0) + 1
+        if logged != toggles[household]:
+            log.append(f"{household}: logged {sum(logged.values())} toggles, expected {sum(toggles[household].values())}")
+    return isolation, log
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else float('nan')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--households", type=int, default=50)
+    parser.add_argument("--sessions", type=int, default=2, help="concurrent sessions per household")
+    parser.add_argument("--storage", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--async-writes", action="store_true", help="run the server with CHECKLIST_ASYNC_WRITES=1")
+    args = parser.parse_args()
+
+    data_root = tempfile.mkdtemp(prefix="checklist_households_")
+    app = import_app(data_root=data_root, storage=args.storage)
+    task_keys = [task.key for task in app.get_task_registry().tasks]
+    households = [f"family-{i:04d}" for i in range(args.households)]
+    for household in households:
+        os.makedirs(app.get_household_dir(household))
+    plans, expected, toggles = {}, {}, {}
+    for i, household in enumerate(households):
+        plans[household], expected[household] = household_plan(i, task_keys, args.sessions)
+        toggles[household] = {}
+        for plan in plans[household]:
+            for key, value in plan:
+                toggles[household][(key, value)] = toggles[household].get((key, value), 0) + 1
+
+    port = free_port()
+    server, server_cwd = start_server(port, data_root, args.storage, args.async_writes)
+    try:
+        results, elapsed = asyncio.run(run_households(port, households, plans))
+        rss, threads = server_status(server.pid)
+        unknown_checkboxes = asyncio.run(probe_household(port, UNKNOWN_HOUSEHOLD))
+    finally:
+        # A clean stop lets queued background writes drain
+        server.send_signal(signal.SIGTERM)
+        server.wait(60)
+
+    isolation, log = verify(app, args.storage, households, expected, toggles)
+    stray = [name for name in os.listdir(data_root) if name != "households"]
+    stray += [os.path.join(server_cwd, name) for name in os.listdir(server_cwd)]
+    isolation.extend(f"file outside the household shards: {name}" for name in stray)
+    unknown = []
+    if unknown_checkboxes:
+        unknown.append(f"{UNKNOWN_HOUSEHOLD} was shown {len(unknown_checkboxes)} checkboxes")
+    if os.path.exists(app.get_household_dir(UNKNOWN_HOUSEHOLD)):
+        unknown.append(f"{UNKNOWN_HOUSEHOLD} got a directory")
+
+    toggle_count = len(results['toggle'])
+    print(f"{args.households} households x {args.sessions} sessions, {args.storage} storage"
+          f"{', async writes' if args.async_writes else ''}")
+    print(f"first load  p50 {percentile(results['load'], 0.5) * 1000:7.1f} ms  p99 {percentile(results['load'], 0.99) * 1000:7.1f} ms")
+    print(f"toggle      p50 {percentile(results['toggle'], 0.5) * 1000:7.1f} ms  p90 {percentile(results['toggle'], 0.9) * 1000:7.1f} ms"
+          f"  p99 {percentile(results['toggle'], 0.99) * 1000:7.1f} ms")
+    print(f"{toggle_count} toggles in {elapsed:.1f} s, {toggle_count / elapsed:.1f} toggles/s")
+    if rss is not None:
+        print(f"server at the end: {rss:.0f} MiB RSS, {threads} threads")
+
+    failed = False
+    for check, problems in (("isolation", isolation), ("log", log), ("unknown", unknown)):
+        for problem in problems[:20]:
+            print(f"FAIL {check}: {problem}")
+        print(f"{check}: {'OK' if not problems else f'{len(problems)} problem(s)'}")
+        failed = failed or bool(problems)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Per-session memory of checklist state, before and after compaction.
+
+Each simulated session views every person in turn, the way a parent clicking
+through the family does, and keeps what the app would leave in st.session_state:
+
+before   a string-keyed state dict plus a bytearray progress object and one
+         checkbox value for every person viewed
+after    a bitmask/epoch-seconds ChecklistProgress and checkbox values for the
+         selected person only; the others are evicted to the shared store
+
+Memory is measured with tracemalloc over all sessions, so the shared store and
+the task registry, which exist once per process, are not counted.
+
+    python benchmarks/session_memory.py --sessions 500 --people 8
+"""
+import argparse
+import sys
+import tempfile
+import tracemalloc
+from datetime import datetime, timedelta
+
+from _common import import_app
+
+
+class LegacyProgress:
+    """The progress object sessions kept before compaction: one byte per task"""
+
+    def __init__(self, registry, state):
+        self.registry = registry
+        self.done = bytearray(registry.total_tasks)
+        self.completed_count = 0
+        self.earned_tickets = 0
+        for task_key, completed in state['completed_tasks'].items():
+            if completed:
+                task = registry.tasks[registry.key_to_id[task_key]]
+                self.done[task.task_id] = 1
+                self.completed_count += 1
+                self.earned_tickets += task.tickets
+
+
+def fill_store(app, registry, people):
+    """Put a half-finished day for each person in a fresh shared store"""
+    store = app.SharedStateStore()
+    start = datetime.now().replace(hour=7, minute=0, second=0, microsecond=0)
+    for i, person in enumerate(people):
+        state = app.create_fresh_checklist(registry)
+        for task in registry.tasks[i % 2::2]:
+            state['completed_tasks'][task.key] = True
+            state['completion_times'][task.key] = (start + timedelta(seconds=137 * task.task_id, microseconds=i)).isoformat()
+        store.put(person, state)
+    return store
+
+
+def session_before(registry, store, people):
+    session = {}
+    for person in people:
+        version, state = store.get(person)
+        session[f'checklist_state_{person}'] = state
+        session[f'checklist_progress_{person}'] = LegacyProgress(registry, state)
+        session[f'checklist_version_{person}'] = version
+        for task in registry.tasks:
+            session[f"checkbox_{person}_{task.key}"] = state['completed_tasks'][task.key]
+    return session
+
+
+def session_after(app, registry, store, people):
+    session = {}
+    for person in people:
+        # evict_other_people(): nothing of the previous person stays behind
+        session.clear()
+        version, state = store.get(person)
+        progress = app.ChecklistProgress.from_state(registry, state)
+        session[f'checklist_progress_{person}'] = progress
+        session[f'checklist_version_{person}'] = version
+        for task in registry.tasks:
+            session[f"checkbox_{person}_{task.key}"] = progress.is_done(task.task_id)
+    return session
+
+
+def measure(build, sessions):
+    """Bytes retained per session by `sessions` sessions built with build()"""
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    retained = [build() for _ in range(sessions)]
+    used = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    del retained
+    return used / sessions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--people", type=int, default=8, help="people each session views")
+    args = parser.parse_args()
+
+    app = import_app(tempfile.mkdtemp(prefix="checklist_memory_"))
+    registry = app.get_task_registry()
+    people = [f"Person{i}" for i in range(args.people)]
+    store = fill_store(app, registry, people)
+
+    # The compact form must round-trip the state it was built from
+    for person in people:
+        _, state = store.get(person)
+        rebuilt = app.ChecklistProgress.from_state(registry, state).to_state()
+        if rebuilt != state:
+            print(f"FAIL: {person}'s state does not round-trip through ChecklistProgress")
+            sys.exit(1)
+
+    before = measure(lambda: session_before(registry, store, people), args.sessions)
+    after = measure(lambda: session_after(app, registry, store, people), args.sessions)
+    print(f"{registry.total_tasks} tasks, {args.people} people viewed per session, {args.sessions} sessions")
+    print(f"before  {before / 1024:8.1f} KiB per session  {before * args.sessions / 2**20:8.1f} MiB total")
+    print(f"after   {after / 1024:8.1f} KiB per session  {after * args.sessions / 2**20:8.1f} MiB total")
+    print(f"reduction {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
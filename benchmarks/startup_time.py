@@ -0,0 +1,81 @@
+"""Cold-start cost of the checklist app.
+
+Each sample runs in a fresh interpreter and a fresh data directory, and records:
+
+  streamlit_import_ms  importing streamlit itself
+  app_import_ms        importing checklistv1 on top of that (module-level code)
+  first_render_ms      the first AppTest run of the script, as a new session sees it
+  heavy_modules        which optional heavy modules ended up loaded (should be none)
+
+    python benchmarks/startup_time.py --samples 5
+
+Prints one JSON object with the median of each timing.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from _common import REPO_ROOT
+
+HEAVY_MODULES = ["pandas", "numpy", "pyarrow", "sqlite3"]
+
+SAMPLE_SCRIPT = """
+import json, logging, sys, time
+logging.disable(logging.WARNING)
+sys.path.insert(0, {repo_root!r})
+
+start = time.perf_counter()
+import streamlit
+streamlit_done = time.perf_counter()
+import checklistv1
+app_done = time.perf_counter()
+heavy_modules = [name for name in {heavy_modules!r} if name in sys.modules]
+
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file({app_file!r}, default_timeout=60)
+render_start = time.perf_counter()
+app.run()
+render_done = time.perf_counter()
+
+print(json.dumps({{
+    'streamlit_import_ms': (streamlit_done - start) * 1000,
+    'app_import_ms': (app_done - streamlit_done) * 1000,
+    'first_render_ms': (render_done - render_start) * 1000,
+    'heavy_modules': heavy_modules,
+}}))
+"""
+
+
+def run_sample():
+    script = SAMPLE_SCRIPT.format(
+        repo_root=REPO_ROOT,
+        heavy_modules=HEAVY_MODULES,
+        app_file=os.path.join(REPO_ROOT, "checklistv1.py"),
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=tempfile.mkdtemp(prefix="checklist_startup_"),
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", type=int, default=5)
+    args = parser.parse_args()
+
+    samples = [run_sample() for _ in range(args.samples)]
+    report = {'samples': args.samples}
+    for metric in ('streamlit_import_ms', 'app_import_ms', 'first_render_ms'):
+        report[metric] = round(statistics.median(sample[metric] for sample in samples), 2)
+    report['heavy_modules'] = sorted({name for sample in samples for name in sample['heavy_modules']})
+    print(json.dumps(report))
+
+
+if __name__ == "__main__":
+    main()
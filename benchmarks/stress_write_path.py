@@ -0,0 +1,131 @@
+"""Stress test for the checklist write path.
+
+Several processes, each running a few threads, toggle tasks for the same
+person at the same time through log_completion() and update_checklist_state().
+Afterwards every log entry and every task's final state must be on disk, and
+a fresh process's daily rollup and ticket ledger must count every process's
+toggles.
+
+    python benchmarks/stress_write_path.py --processes 4 --threads 4 --toggles 200
+    python benchmarks/stress_write_path.py --storage sqlite
+
+Exits non-zero if anything was lost.
+"""
+import argparse
+import multiprocessing
+import sys
+import tempfile
+import threading
+import time
+
+from _common import import_app
+
+PERSON = "Stress"
+
+
+def task_key(worker_id, thread_id):
+    return f"Stress_w{worker_id}_t{thread_id}"
+
+
+def run_worker(data_dir, storage, worker_id, threads, toggles, start_at):
+    app = import_app(data_dir, storage=storage)
+    base_state = {'date': app.get_today_key(), 'completed_tasks': {}, 'completion_times': {}}
+
+    def toggle_loop(thread_id):
+        key = task_key(worker_id, thread_id)
+        for i in range(toggles):
+            completed = i % 2 == 0
+            timestamp = app.datetime.now().isoformat()
+            app.log_completion(PERSON, key, f"{key}_{i}", 1, completed, timestamp)
+            app.update_checklist_state(PERSON, base_state, {key: (completed, timestamp if completed else None)})
+
+    # Line every process up so the writes really overlap
+    time.sleep(max(0, start_at - time.time()))
+    workers = [threading.Thread(target=toggle_loop, args=(thread_id,)) for thread_id in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+
+def verify(app, processes, threads, toggles):
+    """Return a list of problems found in the log and state on disk"""
+    problems = []
+    seen = {}
+    for log_entry in app.read_log_entries(PERSON):
+        seen[log_entry['task']] = seen.get(log_entry['task'], 0) + 1
+
+    for worker_id in range(processes):
+        for thread_id in range(threads):
+            key = task_key(worker_id, thread_id)
+            for i in range(toggles):
+                count = seen.get(f"{key}_{i}", 0)
+                if count != 1:
+                    problems.append(f"log entry {key}_{i} found {count} times")
+
+    state = app.get_storage().load_state(PERSON) or {'completed_tasks': {}}
+    expected = (toggles - 1) % 2 == 0
+    for worker_id in range(processes):
+        for thread_id in range(threads):
+            key = task_key(worker_id, thread_id)
+            if state['completed_tasks'].get(key) != expected:
+                problems.append(f"state for {key} is {state['completed_tasks'].get(key)}, expected {expected}")
+
+    # Every toggle is worth one ticket; even toggles tick, odd ones un-tick
+    registry = app.get_task_registry(PERSON)
+    total = processes * threads * toggles
+    earned = processes * threads * ((toggles + 1) // 2)
+    row = app.get_daily_rollups().days(PERSON, registry).get(app.get_today_key()) or {'toggles': 0, 'earned': 0, 'reversed': 0}
+    if (row['toggles'], row['earned'], row['reversed']) != (total, earned, total - earned):
+        problems.append(f"rollup counts {row['toggles']} toggles, {row['earned']} earned, {row['reversed']} reversed; "
+                        f"expected {total}, {earned}, {total - earned}")
+    totals = app.get_ticket_ledger().totals(PERSON, registry)
+    if (totals['earned'], totals['reversed']) != (earned, total - earned):
+        problems.append(f"ledger has {totals['earned']} earned, {totals['reversed']} reversed; expected {earned}, {total - earned}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--toggles", type=int, default=200, help="toggles per thread")
+    parser.add_argument("--storage", choices=["json", "sqlite"], default="json")
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix="checklist_stress_")
+    context = multiprocessing.get_context("spawn")
+    start_at = time.time() + 2
+    processes = [
+        context.Process(
+            target=run_worker,
+            args=(data_dir, args.storage, worker_id, args.threads, args.toggles, start_at)
+        )
+        for worker_id in range(args.processes)
+    ]
+
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    elapsed = time.time() - start_at
+
+    app = import_app(data_dir, storage=args.storage)
+    problems = verify(app, args.processes, args.threads, args.toggles)
+    total = args.processes * args.threads * args.toggles
+    print(f"{total} toggles from {args.processes} processes x {args.threads} threads "
+          f"in {elapsed:.2f}s ({total / elapsed:.0f} toggles/s) using {args.storage} in {data_dir}")
+
+    failed_workers = [process.exitcode for process in processes if process.exitcode != 0]
+    if failed_workers:
+        problems.append(f"{len(failed_workers)} worker process(es) failed")
+    if problems:
+        for problem in problems[:20]:
+            print(f"FAIL: {problem}")
+        print(f"{len(problems)} problem(s) found")
+        sys.exit(1)
+    print("OK: no log entries or toggles lost")
+
+
+if __name__ == "__main__":
+    main()
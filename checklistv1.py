@@ -1,12 +1,33 @@
 import streamlit as st
 import json
 import os
-from datetime import datetime, time
-import pandas as pd
-from io import StringIO
-import base64
+import copy
+import functools
+import heapq
+import shutil
+import tempfile
+import threading
+import atexit
+import queue
+import re
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque, namedtuple
+from contextlib import contextmanager, nullcontext
+from itertools import groupby
+from datetime import datetime, timedelta
+from time import perf_counter
 from urllib.parse import quote
 
+# Modules only needed by exports, archived log segments, email or the SQLite backend
+# (csv, gzip, sqlite3, pyarrow, smtplib) are imported where they are used to keep cold starts cheap
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
 # Page configuration
 st.set_page_config(
     page_title="Family Daily Checklist",
@@ -76,194 +97,2790 @@ st.markdown("""
         border: 1px solid #DEE2E6;
     }
     
-    .completion-email-section {
-        background: linear-gradient(135deg, #E8F5E8 0%, #C8E6C8 100%);
-        padding: 1.5rem;
-        border-radius: 15px;
-        margin-top: 2rem;
-        border: 2px solid #4CAF50;
-        text-align: center;
-    }
+    .completion-email-section {
+        background: linear-gradient(135deg, #E8F5E8 0%, #C8E6C8 100%);
+        padding: 1.5rem;
+        border-radius: 15px;
+        margin-top: 2rem;
+        border: 2px solid #4CAF50;
+        text-align: center;
+    }
+    
+    .completion-email-disabled {
+        background: #F5F5F5;
+        padding: 1.5rem;
+        border-radius: 15px;
+        margin-top: 2rem;
+        border: 2px solid #CCCCCC;
+        text-align: center;
+        opacity: 0.6;
+    }
+    
+    .sidebar-person-selector {
+        background: #E8F5E8;
+        padding: 1rem;
+        border-radius: 10px;
+        margin-bottom: 1rem;
+    }
+</style>
+""", unsafe_allow_html=True)
+
+# Fragments re-run just their own function on widget interaction (Streamlit >= 1.33);
+# older versions fall back to re-running the whole script
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
+
+# Per-phase timing hooks. Off by default, in which case timed_phase() hands the
+# function back untouched and phase_timer() is a shared no-op context manager.
+METRICS_ENABLED = os.environ.get("CHECKLIST_METRICS", "0") == "1"
+METRICS_FILE = os.environ.get("CHECKLIST_METRICS_FILE", "checklist_metrics.prom")
+METRICS_WINDOW = 1000
+METRICS_EXPORT_INTERVAL_SECONDS = 15
+METRICS_QUANTILES = (0.5, 0.9, 0.99)
+
+class PhaseTimings:
+    """Rolling window of durations per phase, shared by all sessions"""
+    
+    def __init__(self, window):
+        self._lock = threading.Lock()
+        self._window = window
+        self._samples = {}
+        self._counts = {}
+        self._totals = {}
+        self._last_export = 0.0
+    
+    def record(self, phase, seconds):
+        with self._lock:
+            if phase not in self._samples:
+                self._samples[phase] = deque(maxlen=self._window)
+                self._counts[phase] = 0
+                self._totals[phase] = 0.0
+            self._samples[phase].append(seconds)
+            self._counts[phase] += 1
+            self._totals[phase] += seconds
+            export_due = perf_counter() - self._last_export >= METRICS_EXPORT_INTERVAL_SECONDS
+            if export_due:
+                self._last_export = perf_counter()
+        
+        if export_due:
+            try:
+                self.write_prometheus(METRICS_FILE)
+            except OSError:
+                # Metrics must never break a click
+                pass
+    
+    def snapshot(self):
+        """Return [(phase, count, total_seconds, {quantile: seconds})] over the window"""
+        with self._lock:
+            phases = [(phase, self._counts[phase], self._totals[phase], sorted(samples))
+                      for phase, samples in self._samples.items()]
+        
+        rows = []
+        for phase, count, total, samples in sorted(phases):
+            quantiles = {q: samples[min(len(samples) - 1, int(q * len(samples)))] for q in METRICS_QUANTILES}
+            rows.append((phase, count, total, quantiles))
+        return rows
+    
+    def write_prometheus(self, path):
+        """Write a Prometheus text-format file for the node exporter textfile collector"""
+        lines = [
+            "# HELP checklist_phase_seconds Time spent in checklist app phases (rolling window quantiles)",
+            "# TYPE checklist_phase_seconds summary",
+        ]
+        for phase, count, total, quantiles in self.snapshot():
+            for q, seconds in quantiles.items():
+                lines.append(f'checklist_phase_seconds{{phase="{phase}",quantile="{q}"}} {seconds:.6f}')
+            lines.append(f'checklist_phase_seconds_sum{{phase="{phase}"}} {total:.6f}')
+            lines.append(f'checklist_phase_seconds_count{{phase="{phase}"}} {count}')
+        write_file_atomic(path, "\n".join(lines) + "\n")
+
+@st.cache_resource
+def get_phase_timings():
+    return PhaseTimings(METRICS_WINDOW)
+
+@contextmanager
+def _phase_timer(phase):
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        get_phase_timings().record(phase, perf_counter() - start)
+
+_NO_TIMER = nullcontext()
+
+def phase_timer(phase):
+    """Context manager timing a block as phase when metrics are enabled"""
+    return _phase_timer(phase) if METRICS_ENABLED else _NO_TIMER
+
+def timed_phase(phase):
+    """Decorator timing every call of a function as phase when metrics are enabled"""
+    def decorate(func):
+        if not METRICS_ENABLED:
+            return func
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                get_phase_timings().record(phase, perf_counter() - start)
+        return wrapper
+    return decorate
+
+def get_query_param(name):
+    """Read a URL query parameter on both old and new Streamlit versions"""
+    if hasattr(st, "query_params"):
+        return st.query_params.get(name)
+    values = st.experimental_get_query_params().get(name)
+    return values[0] if values else None
+
+def render_debug_panel():
+    """Sidebar table of rolling phase timings, shown with ?debug=1 when metrics are on"""
+    if not METRICS_ENABLED or get_query_param("debug") != "1":
+        return
+    
+    with st.expander("⏱️ Performance", expanded=True):
+        rows = get_phase_timings().snapshot()
+        if not rows:
+            st.caption("No timings recorded yet.")
+            return
+        
+        table = "| Phase | Calls | p50 ms | p90 ms | p99 ms |\n|---|---|---|---|---|\n"
+        for phase, count, _, quantiles in rows:
+            table += f"| {phase} | {count} | " + " | ".join(f"{quantiles[q] * 1000:.2f}" for q in METRICS_QUANTILES) + " |\n"
+        st.markdown(table)
+        st.caption(f"Last {METRICS_WINDOW} calls per phase. Exported to {METRICS_FILE}.")
+
+
+# Households: with CHECKLIST_DATA_ROOT set, each household's files live in
+# <root>/households/<id>/ and one server process serves them all, each with its
+# own storage, caches and locks. The household comes from ?household=<id>, or
+# from the login when <root>/households.json lists who belongs where:
+# {"smith": ["parent@example.com", ...], ...}. Without households.json only
+# households whose directory exists can be opened, plus the default one, unless
+# CHECKLIST_NEW_HOUSEHOLDS=1 lets any ?household= id create its own. Without a
+# data root everything stays in the working directory as a single household.
+DATA_ROOT = os.environ.get("CHECKLIST_DATA_ROOT", "")
+DEFAULT_HOUSEHOLD = os.environ.get("CHECKLIST_HOUSEHOLD", "default")
+NEW_HOUSEHOLDS = os.environ.get("CHECKLIST_NEW_HOUSEHOLDS", "0") == "1"
+HOUSEHOLDS_FILE = os.path.join(DATA_ROOT, "households.json")
+HOUSEHOLD_ID_PATTERN = re.compile(r"[a-z0-9][a-z0-9_-]{0,63}")
+
+def get_household_dir(household_id):
+    """The household's shard directory; the working directory when there is no data root"""
+    if not DATA_ROOT:
+        return ""
+    return os.path.join(DATA_ROOT, "households", household_id)
+
+class Household:
+    """One household's data directory and the objects its sessions share
+    
+    Each object is created the first time a session of the household asks for
+    it and kept for the life of the process, so households never share a
+    file, lock or cache and an idle household costs nothing but this object.
+    """
+    
+    def __init__(self, household_id, data_dir):
+        self.household_id = household_id
+        self.data_dir = data_dir
+        # Reentrant: creating the ledger creates the storage it reads from
+        self._lock = threading.RLock()
+        self._objects = {}
+    
+    def path(self, name):
+        return os.path.join(self.data_dir, name)
+    
+    def get(self, name, create):
+        """Return the household's object called name, calling create() the first time"""
+        obj = self._objects.get(name)
+        if obj is None:
+            with self._lock:
+                obj = self._objects.get(name)
+                if obj is None:
+                    obj = self._objects[name] = create()
+        return obj
+
+@st.cache_resource
+def open_household(household_id):
+    data_dir = get_household_dir(household_id)
+    if data_dir:
+        os.makedirs(data_dir, exist_ok=True)
+    return Household(household_id, data_dir)
+
+def get_household():
+    """The current session's household, shared by all of its sessions"""
+    return open_household(st.session_state.get('household', DEFAULT_HOUSEHOLD))
+
+def get_login_email():
+    """The logged-in user's email, or None if nobody is logged in or login is not set up"""
+    user = st.user if hasattr(st, "user") else getattr(st, "experimental_user", None)
+    if user is None or not user.get("is_logged_in"):
+        return None
+    email = user.get("email")
+    return email.strip().lower() if email else None
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def load_household_members(signature):
+    """Map each member's email to their household, from HOUSEHOLDS_FILE as of signature"""
+    with open(HOUSEHOLDS_FILE, 'r') as f:
+        households = json.load(f)
+    members = {}
+    for household_id, emails in households.items():
+        if not HOUSEHOLD_ID_PATTERN.fullmatch(household_id):
+            raise ValueError(f"{household_id!r} is not a valid household id")
+        for email in emails:
+            members[email.strip().lower()] = household_id
+    return members
+
+def select_household():
+    """Work out the session's household and keep it in the session
+    
+    Returns the household id, or None after showing why there is none.
+    """
+    if not DATA_ROOT:
+        household_id = DEFAULT_HOUSEHOLD
+    else:
+        try:
+            file_stat = os.stat(HOUSEHOLDS_FILE)
+        except FileNotFoundError:
+            file_stat = None
+        
+        if file_stat is not None:
+            # Members only: the URL cannot pick someone else's household
+            email = get_login_email()
+            if email is None:
+                st.info("Log in to open your household's checklist.")
+                st.button("Log in", on_click=st.login)
+                return None
+            try:
+                household_id = load_household_members((file_stat.st_mtime_ns, file_stat.st_size)).get(email)
+            except (OSError, ValueError, AttributeError) as e:
+                st.error(f"Error reading {HOUSEHOLDS_FILE}: {e}")
+                return None
+            if household_id is None:
+                st.error(f"{email} is not a member of any household.")
+                return None
+        else:
+            household_id = (get_query_param("household") or DEFAULT_HOUSEHOLD).strip().lower()
+            if not HOUSEHOLD_ID_PATTERN.fullmatch(household_id):
+                st.error(f"{household_id!r} is not a valid household id: use lowercase letters, digits, '-' and '_'.")
+                return None
+            if not (NEW_HOUSEHOLDS or household_id == DEFAULT_HOUSEHOLD
+                    or os.path.isdir(get_household_dir(household_id))):
+                st.error(f"There is no household {household_id!r}.")
+                return None
+    
+    if st.session_state.get('household') != household_id:
+        # People in the previous household may share names with this one's
+        evict_other_people(None)
+        st.session_state['household'] = household_id
+    return household_id
+
+
+# Default people; a config file can replace them (see SchemaLoader)
+PEOPLE = ["Jonathan", "Anthony"]
+
+# File paths (will be person-specific)
+def get_checklist_file(person):
+    return f"checklist_state_{person.lower()}.json"
+
+def get_log_file(person):
+    return f"checklist_log_{person.lower()}.jsonl"
+
+def get_legacy_log_file(person):
+    return f"checklist_log_{person.lower()}.json"
+
+def get_log_dir(person):
+    return f"checklist_log_{person.lower()}"
+
+def get_lock_file(person):
+    return f"checklist_{person.lower()}.lock"
+
+def get_rollup_file(person):
+    return f"checklist_rollup_{person.lower()}.jsonl"
+
+def get_redemption_file(person):
+    return f"checklist_redemptions_{person.lower()}.jsonl"
+
+# Per-person progress summaries read by the family overview
+SUMMARY_FILE = "checklist_summary.jsonl"
+SUMMARY_LOCK_FILE = "checklist_summary.lock"
+
+# Each person's final state of every finished day
+STATE_HISTORY_FILE = "checklist_state_history.jsonl"
+STATE_HISTORY_LOCK_FILE = "checklist_state_history.lock"
+
+# Default checklist items with categories; a config file can replace them
+CHECKLIST_ITEMS = {
+    "Morning Routine": [
+        {"task": "Make Bed", "tickets": 1},
+        {"task": "Eat and Clean up", "tickets": 1},
+        {"task": "Dressed and sunscreen", "tickets": 2},
+        {"task": "Brush hair and teeth", "tickets": 1},
+    ],
+    "Daily Activities": [
+        {"task": "Pick up all clothes of floor", "tickets": 1},
+        {"task": "Read 20 minutes", "tickets": 4},
+        {"task": "Martial Arts Practice", "tickets": 0},  # Handwritten note
+        {"task": "Guitar 7 minutes", "tickets": 4},
+        {"task": "Math pages", "tickets": 3},
+        {"task": "Workbook pages", "tickets": 3},
+    ],
+    "Evening Routine": [
+        {"task": "Bath quickly", "tickets": 2},
+        {"task": "In bed before 9", "tickets": 1},
+    ],
+    "Chores": [
+        {"task": "Clean up toys", "tickets": 3},
+        {"task": "Feed animals", "tickets": 1},
+        {"task": "Fold laundry", "tickets": 2},
+        {"task": "Put away laundry", "tickets": 2},
+        {"task": "Vacuum", "tickets": 4},
+        {"task": "Empty dishwasher", "tickets": 4},
+        {"task": "Brush cats", "tickets": 2},
+        {"task": "Empty trash cans", "tickets": 2},
+        {"task": "Clean bathroom", "tickets": 10},
+    ],
+    "Behavior": [
+        {"task": "Be polite no fighting", "tickets": 3},
+        {"task": "Speak kind all day", "tickets": 3},
+    ]
+}
+
+# A single task compiled from a checklist; task_id is its dense index
+Task = namedtuple('Task', ['task_id', 'category', 'name', 'tickets', 'key'])
+
+class TaskRegistry:
+    """A checklist compiled once into dense task ids and precomputed totals
+    
+    A task may list the keys it was saved under before a rename in
+    'renamed_from'; those keys resolve to it through key_to_id.
+    """
+    
+    def __init__(self, checklist_items):
+        self.checklist_items = checklist_items
+        tasks = []
+        categories = []
+        renamed = {}
+        for category, category_tasks in checklist_items.items():
+            task_ids = []
+            for task in category_tasks:
+                task_id = len(tasks)
+                tasks.append(Task(task_id, category, task['task'], task['tickets'], f"{category}_{task['task']}"))
+                task_ids.append(task_id)
+                for old_key in task.get('renamed_from', ()):
+                    renamed[old_key] = task_id
+            categories.append((category, tuple(task_ids)))
+        
+        self.tasks = tuple(tasks)
+        self.categories = tuple(categories)
+        self.key_to_id = {**renamed, **{task.key: task.task_id for task in self.tasks}}
+        # Older log entries only carry the task name; the first task with a name wins
+        self.name_to_id = {}
+        for task in self.tasks:
+            self.name_to_id.setdefault(task.name, task.task_id)
+        self.total_tasks = len(self.tasks)
+        self.total_tickets = sum(task.tickets for task in self.tasks)
+
+# People and checklists come from CONFIG_FILE when it exists, otherwise from
+# PEOPLE and CHECKLIST_ITEMS above. The file is JSON:
+#
+#   {"people": ["Jonathan", "Anthony"],
+#    "checklist": {"Morning Routine": [{"task": "Make Bed", "tickets": 1}, ...], ...},
+#    "person_checklists": {"Anthony": {"Chores": [...]}},
+#    "email_to": ["parent@example.com"]}
+#
+# "checklist" is everyone's list unless "person_checklists" gives the person
+# their own; checklist_config.example.json holds the defaults to start from.
+# "email_to" receives the household's completion emails in place of
+# CHECKLIST_EMAIL_TO. A relative path is read from each household's directory.
+# Edits are picked up on the next run without a restart.
+CONFIG_FILE = os.environ.get("CHECKLIST_CONFIG", "checklist_config.json")
+
+class ChecklistSchema:
+    """People and their compiled checklists, from one version of the config"""
+    
+    def __init__(self, people, checklist_items, person_checklists=None, signature=None, previous=None, email_to=None):
+        self.people = tuple(people)
+        self.email_to = tuple(email_to) if email_to is not None else None
+        self.signature = signature
+        # Checklists that did not change keep their registry, so sessions keep their progress as is
+        reusable = {}
+        if previous is not None:
+            for registry in (previous.default_registry, *previous.registries.values()):
+                reusable[json.dumps(registry.checklist_items, sort_keys=True)] = registry
+        
+        def compile_checklist(items):
+            return reusable.get(json.dumps(items, sort_keys=True)) or TaskRegistry(items)
+        
+        self.default_registry = compile_checklist(checklist_items)
+        self.registries = {person: compile_checklist(items) for person, items in (person_checklists or {}).items()}
+    
+    def registry(self, person=None):
+        """The compiled checklist of person, or the shared one"""
+        return self.registries.get(person, self.default_registry)
+
+def validate_checklist(checklist_items, where):
+    """Raise ValueError unless checklist_items is {category: [{'task', 'tickets'}, ...]} with unique tasks"""
+    if not isinstance(checklist_items, dict) or not checklist_items:
+        raise ValueError(f"{where} must map categories to task lists")
+    keys = set()
+    for category, tasks in checklist_items.items():
+        if not isinstance(tasks, list):
+            raise ValueError(f"{where}: {category} must be a list of tasks")
+        for task in tasks:
+            if not isinstance(task, dict) or not isinstance(task.get('task'), str) or not task['task']:
+                raise ValueError(f"{where}: every task in {category} needs a 'task' name")
+            if not isinstance(task.get('tickets'), int) or task['tickets'] < 0:
+                raise ValueError(f"{where}: {task['task']} needs a whole number of 'tickets'")
+            if not isinstance(task.get('renamed_from', []), list):
+                raise ValueError(f"{where}: 'renamed_from' of {task['task']} must be a list of old task keys")
+            key = f"{category}_{task['task']}"
+            if key in keys:
+                raise ValueError(f"{where}: {task['task']} is listed twice in {category}")
+            keys.add(key)
+
+class SchemaLoader:
+    """The current ChecklistSchema, recompiled only when the config file changes on disk
+    
+    A config that fails to load leaves the last good schema in place and the
+    reason in last_error.
+    """
+    
+    def __init__(self, config_file):
+        self.config_file = config_file
+        self._lock = threading.Lock()
+        self._schema = None
+        self._failed_signature = None
+        self.last_error = None
+    
+    def get(self):
+        try:
+            file_stat = os.stat(self.config_file)
+            signature = (file_stat.st_mtime_ns, file_stat.st_size)
+        except FileNotFoundError:
+            signature = None
+        schema = self._schema
+        if schema is not None and signature in (schema.signature, self._failed_signature):
+            return schema
+        
+        with self._lock:
+            if self._schema is None or signature not in (self._schema.signature, self._failed_signature):
+                try:
+                    self._schema = self._compile(signature)
+                    self._failed_signature = None
+                    self.last_error = None
+                except (OSError, ValueError) as e:
+                    self._failed_signature = signature
+                    self.last_error = f"{self.config_file}: {e}"
+                    if self._schema is None:
+                        self._schema = ChecklistSchema(PEOPLE, CHECKLIST_ITEMS)
+            return self._schema
+    
+    def _compile(self, signature):
+        if signature is None:
+            return ChecklistSchema(PEOPLE, CHECKLIST_ITEMS, previous=self._schema)
+        with open(self.config_file, 'r') as f:
+            config = json.load(f)
+        if not isinstance(config, dict):
+            raise ValueError("the config must be a JSON object")
+        
+        people = config.get('people', PEOPLE)
+        if not isinstance(people, list) or not people or not all(isinstance(person, str) and person for person in people):
+            raise ValueError("'people' must be a non-empty list of names")
+        if len({person.lower() for person in people}) != len(people):
+            raise ValueError("'people' lists someone twice")
+        checklist_items = config.get('checklist', CHECKLIST_ITEMS)
+        validate_checklist(checklist_items, "'checklist'")
+        person_checklists = config.get('person_checklists', {})
+        if not isinstance(person_checklists, dict):
+            raise ValueError("'person_checklists' must map people to checklists")
+        for person, items in person_checklists.items():
+            validate_checklist(items, f"'person_checklists' for {person}")
+        email_to = config.get('email_to')
+        if email_to is not None and (not isinstance(email_to, list) or not all(isinstance(address, str) and address for address in email_to)):
+            raise ValueError("'email_to' must be a list of email addresses")
+        return ChecklistSchema(people, checklist_items, person_checklists, signature, previous=self._schema, email_to=email_to)
+
+def get_schema_loader():
+    household = get_household()
+    return household.get('schema_loader', lambda: SchemaLoader(household.path(CONFIG_FILE)))
+
+def get_people():
+    """Everyone with a checklist, from the current config"""
+    return get_schema_loader().get().people
+
+def get_task_registry(person=None):
+    """Return person's compiled checklist (the shared one if person is None), shared by all sessions"""
+    return get_schema_loader().get().registry(person)
+
+class ChecklistProgress:
+    """A person's day as a completion bitmask plus an epoch-seconds array
+    
+    This is all a session keeps for the person it shows, instead of the
+    string-keyed state dict; to_state() rebuilds the dict when it is saved.
+    """
+    
+    def __init__(self, registry, date=None):
+        self.registry = registry
+        self.date = date
+        self.done = 0
+        # Completion time of each task in epoch seconds, 0.0 while not done
+        self.times = array('d', bytes(8 * registry.total_tasks))
+        self.completed_count = 0
+        self.earned_tickets = 0
+        # Log entries already folded in, in event-sourced mode
+        self.log_rows = None
+    
+    @classmethod
+    def from_state(cls, registry, state):
+        """Build progress from a string-keyed state dict, ignoring unknown task keys"""
+        progress = cls(registry, state.get('date'))
+        completed_tasks = state.get('completed_tasks', {})
+        completion_times = state.get('completion_times', {})
+        for task_key, completed in completed_tasks.items():
+            task_id = registry.key_to_id.get(task_key)
+            if task_id is None or not completed:
+                continue
+            # A key from before a rename only counts if the state has nothing under the new one
+            if task_key != registry.tasks[task_id].key and registry.tasks[task_id].key in completed_tasks:
+                continue
+            progress.set(task_id, True, completion_times.get(task_key))
+        progress.log_rows = state.get('log_rows')
+        return progress
+    
+    def remap(self, registry):
+        """This progress moved onto another version of the checklist, matching tasks by key"""
+        progress = ChecklistProgress(registry, self.date)
+        progress.log_rows = self.log_rows
+        for task in self.registry.tasks:
+            task_id = registry.key_to_id.get(task.key)
+            if task_id is not None and self.is_done(task.task_id):
+                progress.set(task_id, True)
+                progress.times[task_id] = self.times[task.task_id]
+        return progress
+    
+    def to_state(self):
+        """The string-keyed state dict storage and the shared store work with"""
+        state = {'date': self.date, 'completed_tasks': {}, 'completion_times': {}}
+        for task in self.registry.tasks:
+            state['completed_tasks'][task.key] = self.is_done(task.task_id)
+            state['completion_times'][task.key] = self.completion_time(task.task_id)
+        if self.log_rows is not None:
+            state['log_rows'] = self.log_rows
+        return state
+    
+    def is_done(self, task_id):
+        return bool(self.done >> task_id & 1)
+    
+    def completion_time(self, task_id):
+        """ISO timestamp the task was completed at, or None"""
+        if not self.times[task_id]:
+            return None
+        return datetime.fromtimestamp(self.times[task_id]).isoformat()
+    
+    def set(self, task_id, completed, timestamp=None):
+        """Set one task's flag and completion time; returns True if the flag changed"""
+        self.times[task_id] = datetime.fromisoformat(timestamp).timestamp() if completed and timestamp else 0.0
+        if self.is_done(task_id) == completed:
+            return False
+        
+        delta = 1 if completed else -1
+        self.done ^= 1 << task_id
+        self.completed_count += delta
+        self.earned_tickets += delta * self.registry.tasks[task_id].tickets
+        return True
+    
+    @property
+    def remaining(self):
+        return self.registry.total_tasks - self.completed_count
+    
+    @property
+    def is_complete(self):
+        return self.completed_count == self.registry.total_tasks
+
+def set_checklist_state(person, state):
+    """Replace a person's progress in the session with one compiled from state"""
+    st.session_state[f'checklist_progress_{person}'] = ChecklistProgress.from_state(get_task_registry(person), state)
+
+def evict_other_people(person):
+    """Drop everyone but person (everyone if None) from the session; the shared store keeps their state
+    
+    Switching back costs one copy out of the store, so a session holds one
+    person's progress and checkbox values however many people it has viewed.
+    """
+    resident = () if person is None else (f'checklist_progress_{person}', f'checklist_version_{person}')
+    checkbox_prefix = f"checkbox_{person}_"
+    for key in list(st.session_state.keys()):
+        if key.startswith(('checklist_progress_', 'checklist_version_')):
+            evict = key not in resident
+        else:
+            evict = key.startswith("checkbox_") and (person is None or not key.startswith(checkbox_prefix))
+        if evict:
+            del st.session_state[key]
+
+class SharedStateStore:
+    """Each person's current checklist state, shared by every session in the process
+    
+    Every write bumps the person's version, so a session only re-copies the
+    state when its own version is behind.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+    
+    def version(self, person):
+        entry = self._entries.get(person)
+        return entry[0] if entry is not None else 0
+    
+    def get(self, person):
+        """Return (version, private copy of state), loading from storage on a miss"""
+        with self._lock:
+            entry = self._entries.get(person)
+        # No date check here: the midnight scheduler invalidates everyone at rollover
+        if entry is None or entry[1] is None:
+            entry = self.put(person, load_checklist_state(person))
+        return entry[0], copy_state(entry[1])
+    
+    def put(self, person, state):
+        """Store a copy of state as the person's newest version"""
+        with self._lock:
+            entry = (self.version(person) + 1, copy_state(state))
+            self._entries[person] = entry
+        return entry
+    
+    def apply(self, person, date, changes, logged=None):
+        """Apply task changes to the cached state without touching storage
+        
+        logged is how many log entries the changes came from, if not one each.
+        """
+        with self._lock:
+            entry = self._entries.get(person)
+            if entry is None or entry[1] is None or entry[1].get('date') != date:
+                return None
+            state = copy_state(entry[1])
+            for task_key, (completed, completion_time) in changes.items():
+                state['completed_tasks'][task_key] = completed
+                state['completion_times'][task_key] = completion_time
+            if 'log_rows' in state:
+                state['log_rows'] += len(changes) if logged is None else logged
+            entry = (entry[0] + 1, state)
+            self._entries[person] = entry
+        return entry
+    
+    def invalidate(self, person):
+        """Make the next get() reload the person's state; the version still moves forward"""
+        with self._lock:
+            self._entries[person] = (self.version(person) + 1, None)
+    
+    def invalidate_before(self, people, date):
+        """Invalidate everyone in people whose cached state is from a day before date"""
+        with self._lock:
+            for person in people:
+                entry = self._entries.get(person)
+                if entry is not None and entry[1] is not None and entry[1].get('date', '') < date:
+                    self._entries[person] = (entry[0] + 1, None)
+
+def get_state_store():
+    return get_household().get('state_store', SharedStateStore)
+
+def get_checklist_progress(person):
+    """Return a person's progress, refreshing it from the shared store if another session changed it"""
+    progress_key = f'checklist_progress_{person}'
+    version_key = f'checklist_version_{person}'
+    store = get_state_store()
+    if progress_key not in st.session_state or st.session_state.get(version_key) != store.version(person):
+        version, state = store.get(person)
+        set_checklist_state(person, state)
+        st.session_state[version_key] = version
+    
+    progress = st.session_state[progress_key]
+    registry = get_task_registry(person)
+    if progress.registry is not registry:
+        # The config changed: carry the ticks over instead of reloading the state
+        progress = st.session_state[progress_key] = progress.remap(registry)
+    return progress
+
+# Event-sourced mode: the completion log is the source of truth and the state
+# file is only a snapshot, rewritten every STATE_SNAPSHOT_EVERY toggles
+EVENT_SOURCED_STATE = os.environ.get("CHECKLIST_EVENT_SOURCED", "0") == "1"
+STATE_SNAPSHOT_EVERY = 10
+
+# Storage backend: "json" keeps per-person files in the household's directory,
+# "sqlite" keeps everything in one WAL-mode database per household. CHECKLIST_DB
+# is that database's path inside the household's directory; an absolute path
+# would put every household in one database, so it is refused with a data root.
+STORAGE_BACKEND = os.environ.get("CHECKLIST_STORAGE", "json")
+SQLITE_DB_FILE = os.environ.get("CHECKLIST_DB", "checklist.db")
+
+# Index of the per-person log segments, and how many months of history stay uncompressed
+LOG_INDEX_FILE = "index.json"
+LOG_ARCHIVE_AFTER_MONTHS = 12
+
+def get_log_entry_date(log_entry):
+    return log_entry.get('date') or log_entry['timestamp'][:10]
+
+def shift_month(month, months):
+    """Move a 'YYYY-MM' key by a number of months"""
+    year, month_number = divmod(int(month[:4]) * 12 + int(month[5:7]) - 1 + months, 12)
+    return f"{year:04d}-{month_number + 1:02d}"
+
+def iter_segment_entries(segment_file):
+    """Yield the entries of one JSONL (optionally gzipped) log segment"""
+    if segment_file.endswith('.gz'):
+        import gzip
+        opener = gzip.open
+    else:
+        opener = open
+    with opener(segment_file, 'rt') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # A torn final line from an interrupted append - skip it
+                continue
+
+@contextmanager
+def file_lock(lock_file):
+    """Hold an exclusive lock on lock_file, across threads and processes"""
+    with open(lock_file, 'a') as f:
+        if fcntl is None:
+            # No advisory locks on this platform; callers still get atomic writes
+            yield
+            return
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+def write_file_atomic(path, content):
+    """Write content to a temp file next to path, fsync it, then rename it over path"""
+    directory = os.path.dirname(path) or "."
+    fd, temp_file = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, path)
+    except BaseException:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise
+
+class GroupCommitter:
+    """Coalesces concurrent appends into one write and one fsync per file
+    
+    The first thread to arrive writes everything queued so far; threads that
+    queue while it is busy wait and are committed together in the next batch.
+    """
+    
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._pending = []
+        self._queued = 0
+        self._committed = 0
+        self._writing = False
+        self._errors = {}
+    
+    def append(self, path, data):
+        """Append data to path; returns once it has been fsynced"""
+        with self._cond:
+            self._queued += 1
+            ticket = self._queued
+            self._pending.append((ticket, path, data))
+            
+            while self._committed < ticket:
+                if self._writing:
+                    self._cond.wait()
+                    continue
+                
+                self._writing = True
+                batch, self._pending = self._pending, []
+                self._cond.release()
+                try:
+                    failed = self._write_batch(batch)
+                finally:
+                    self._cond.acquire()
+                    self._writing = False
+                    self._committed = batch[-1][0]
+                    self._errors.update(failed)
+                    self._cond.notify_all()
+            
+            error = self._errors.pop(ticket, None)
+        if error is not None:
+            raise error
+    
+    def _write_batch(self, batch):
+        data_by_path = {}
+        tickets_by_path = {}
+        for ticket, path, data in batch:
+            data_by_path.setdefault(path, []).append(data)
+            tickets_by_path.setdefault(path, []).append(ticket)
+        
+        failed = {}
+        for path, chunks in data_by_path.items():
+            try:
+                fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                try:
+                    if fcntl is not None:
+                        # Keeps batches from other processes from interleaving with ours
+                        fcntl.flock(fd, fcntl.LOCK_EX)
+                    os.write(fd, "".join(chunks).encode('utf-8'))
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+            except Exception as e:
+                for ticket in tickets_by_path[path]:
+                    failed[ticket] = e
+        return failed
+
+def copy_state(state):
+    """Copy a state dict deeply enough that editing tasks leaves the original alone"""
+    return {
+        **state,
+        'completed_tasks': dict(state.get('completed_tasks', {})),
+        'completion_times': dict(state.get('completion_times', {}))
+    }
+
+class JsonFileStorage:
+    """Checklist state and completion log kept in per-person JSON files under data_dir"""
+    
+    name = "json"
+    
+    def __init__(self, data_dir=""):
+        self.data_dir = data_dir
+        # Parsed JSON files shared by every session: path -> ((mtime_ns, size), data)
+        self._json_cache = {}
+        self._cache_lock = threading.Lock()
+        self._committer = GroupCommitter()
+        self._summary_lock = threading.Lock()
+        self._summary_inode = None
+        self._summary_offset = 0
+        self._summary_rows = 0
+        self._summaries = {}
+    
+    def _path(self, name):
+        return os.path.join(self.data_dir, name)
+    
+    def _load_cached_json(self, path):
+        """Parse a JSON file at most once per change on disk; None if missing"""
+        try:
+            file_stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        
+        signature = (file_stat.st_mtime_ns, file_stat.st_size)
+        with self._cache_lock:
+            cached = self._json_cache.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        
+        with open(path, 'r') as f:
+            data = json.load(f)
+        with self._cache_lock:
+            self._json_cache[path] = (signature, data)
+        return data
+    
+    def _write_json(self, path, data, indent=None):
+        with self._cache_lock:
+            self._json_cache.pop(path, None)
+        write_file_atomic(path, json.dumps(data, indent=indent))
+    
+    def load_state(self, person):
+        """Return the saved state dict, or None if there is none"""
+        state = self._load_cached_json(self._path(get_checklist_file(person)))
+        # Sessions edit their state in place, so never hand out the cached dicts
+        return copy_state(state) if state is not None else None
+    
+    def load_state_date(self, person):
+        """Return the date of the saved state without copying it"""
+        state = self._load_cached_json(self._path(get_checklist_file(person)))
+        return state.get('date', '') if state is not None else None
+    
+    def save_state(self, person, state):
+        with file_lock(self._path(get_lock_file(person))):
+            self._write_json(self._path(get_checklist_file(person)), state, indent=2)
+    
+    def update_state(self, person, state, changes):
+        """Apply task changes on top of the saved state and return the merged state
+        
+        changes maps task_key -> (completed, completion_time). Merging under the
+        person's lock keeps toggles made by other sessions since this one loaded.
+        """
+        with file_lock(self._path(get_lock_file(person))):
+            saved = self.load_state(person)
+            merged = saved if saved is not None and saved.get('date') == state['date'] else copy_state(state)
+            for task_key, (completed, completion_time) in changes.items():
+                merged['completed_tasks'][task_key] = completed
+                merged['completion_times'][task_key] = completion_time
+            self._write_json(self._path(get_checklist_file(person)), merged, indent=2)
+        return merged
+    
+    # Completion log: dated JSONL segments in checklist_log_<person>/ plus an
+    # index.json of segment name -> {first_date, last_date, rows}. The current
+    # segments are per day; rows stays None until a newer segment seals it.
+    
+    def _load_log_index(self, person):
+        index = self._load_cached_json(os.path.join(self._path(get_log_dir(person)), LOG_INDEX_FILE))
+        return copy.deepcopy(index) if index is not None else {}
+    
+    def _save_log_index(self, log_dir, index):
+        self._write_json(os.path.join(log_dir, LOG_INDEX_FILE), index, indent=2)
+    
+    def _add_to_index(self, log_dir, index, log_entries):
+        """Register entries in the index and group their lines by segment file
+        
+        Returns (lines_by_file, changed, created): whether the index needs
+        saving, and whether a new segment was started.
+        """
+        lines_by_file = {}
+        changed = created = False
+        for log_entry in log_entries:
+            log_date = get_log_entry_date(log_entry)
+            segment = f"{log_date}.jsonl"
+            lines_by_file.setdefault(os.path.join(log_dir, segment), []).append(json.dumps(log_entry) + "\n")
+            
+            if segment not in index:
+                index[segment] = {'first_date': log_date, 'last_date': log_date, 'rows': None}
+                changed = created = True
+            elif index[segment]['rows'] is not None:
+                # A sealed segment receiving a late entry just gets its count bumped
+                index[segment]['rows'] += 1
+                changed = True
+        
+        if created:
+            # Only the newest day stays open; a late entry's new segment for
+            # an older day is sealed straight away
+            newest = max(info['last_date'] for info in index.values())
+            for segment, info in index.items():
+                if info['rows'] is None and info['last_date'] < newest:
+                    segment_file = os.path.join(log_dir, segment)
+                    # What is on disk plus this batch's lines, which are written after
+                    on_disk = sum(1 for _ in iter_segment_entries(segment_file)) if os.path.exists(segment_file) else 0
+                    info['rows'] = on_disk + len(lines_by_file.get(segment_file, ()))
+        return lines_by_file, changed, created
+    
+    def migrate_legacy_log(self, person):
+        """One-time move of older single-file logs into dated segments"""
+        legacy_sources = ((self._path(get_legacy_log_file(person)), True), (self._path(get_log_file(person)), False))
+        if not any(os.path.exists(path) for path, _ in legacy_sources):
+            return False
+        
+        with file_lock(self._path(get_lock_file(person))):
+            # Another process may have migrated while we waited for the lock
+            legacy_files = [(path, is_array) for path, is_array in legacy_sources if os.path.exists(path)]
+            if not legacy_files:
+                return False
+            
+            log_dir = self._path(get_log_dir(person))
+            # Build a brand new log in a temp dir, so a crash never leaves it half-migrated
+            target_dir = log_dir if os.path.isdir(log_dir) else f"{log_dir}.tmp"
+            if target_dir != log_dir:
+                shutil.rmtree(target_dir, ignore_errors=True)
+            os.makedirs(target_dir, exist_ok=True)
+            
+            index = self._load_log_index(person) if target_dir == log_dir else {}
+            for path, is_array in legacy_files:
+                if is_array:
+                    with open(path, 'r') as f:
+                        log_entries = json.load(f)
+                else:
+                    log_entries = list(iter_segment_entries(path))
+                lines_by_file, _, _ = self._add_to_index(target_dir, index, log_entries)
+                for segment_file, lines in lines_by_file.items():
+                    with open(segment_file, 'a') as f:
+                        f.writelines(lines)
+            self._save_log_index(target_dir, index)
+            
+            if target_dir != log_dir:
+                os.replace(target_dir, log_dir)
+            for path, _ in legacy_files:
+                os.replace(path, f"{path}.migrated")
+        return True
+    
+    def append_log(self, person, log_entry):
+        self.append_log_many(person, [log_entry])
+    
+    def append_log_many(self, person, log_entries):
+        self.migrate_legacy_log(person)
+        log_dir = self._path(get_log_dir(person))
+        
+        # The index changes once per new segment, so most appends skip the lock
+        index = self._load_log_index(person)
+        lines_by_file, changed, created = self._add_to_index(log_dir, index, log_entries)
+        if changed:
+            with file_lock(self._path(get_lock_file(person))):
+                # Redo against the index as it is under the lock
+                os.makedirs(log_dir, exist_ok=True)
+                index = self._load_log_index(person)
+                lines_by_file, changed, created = self._add_to_index(log_dir, index, log_entries)
+                if changed:
+                    self._save_log_index(log_dir, index)
+        
+        # Concurrent appends share one write and fsync per segment file
+        for segment_file, lines in lines_by_file.items():
+            self._committer.append(segment_file, "".join(lines))
+        
+        if created:
+            self.compact_log(person, get_log_entry_date(log_entries[-1]))
+    
+    def compact_log(self, person, today):
+        """Merge day segments of past months into month segments and gzip old months"""
+        with file_lock(self._path(get_lock_file(person))):
+            self._compact_log_locked(person, today)
+    
+    def _compact_log_locked(self, person, today):
+        log_dir = self._path(get_log_dir(person))
+        index = self._load_log_index(person)
+        current_month = today[:7]
+        
+        days_by_month = {}
+        for segment, info in index.items():
+            if segment == f"{info['first_date']}.jsonl" and info['first_date'][:7] < current_month:
+                days_by_month.setdefault(info['first_date'][:7], []).append(segment)
+        
+        for month, day_segments in days_by_month.items():
+            month_segment = f"{month}.jsonl"
+            sources = sorted(day_segments)
+            if month_segment in index:
+                sources.insert(0, month_segment)
+            
+            # Write the merged month, then point the index at it, then delete the days
+            temp_file = os.path.join(log_dir, f"{month_segment}.tmp")
+            rows = 0
+            with open(temp_file, 'w') as out:
+                for segment in sources:
+                    segment_file = os.path.join(log_dir, segment)
+                    if not os.path.exists(segment_file):
+                        # Registered by an append that never got written
+                        continue
+                    for log_entry in iter_segment_entries(segment_file):
+                        out.write(json.dumps(log_entry) + "\n")
+                        rows += 1
+            os.replace(temp_file, os.path.join(log_dir, month_segment))
+            
+            index[month_segment] = {
+                'first_date': min(index[segment]['first_date'] for segment in sources),
+                'last_date': max(index[segment]['last_date'] for segment in sources),
+                'rows': rows
+            }
+            for segment in day_segments:
+                del index[segment]
+            self._save_log_index(log_dir, index)
+            for segment in day_segments:
+                os.remove(os.path.join(log_dir, segment))
+        
+        # Months older than LOG_ARCHIVE_AFTER_MONTHS are kept gzipped
+        import gzip
+        archive_before = shift_month(current_month, -LOG_ARCHIVE_AFTER_MONTHS)
+        for segment, info in list(index.items()):
+            if segment == f"{info['first_date'][:7]}.jsonl" and segment[:7] < archive_before:
+                archive_segment = f"{segment}.gz"
+                archive_file = os.path.join(log_dir, archive_segment)
+                if archive_segment in index:
+                    # Late entries for an archived month go in as an extra gzip member
+                    with open(os.path.join(log_dir, segment), 'rb') as src, gzip.open(archive_file, 'ab') as out:
+                        shutil.copyfileobj(src, out)
+                    archived = index[archive_segment]
+                    index[archive_segment] = {
+                        'first_date': min(archived['first_date'], info['first_date']),
+                        'last_date': max(archived['last_date'], info['last_date']),
+                        'rows': archived['rows'] + info['rows']
+                    }
+                    del index[segment]
+                else:
+                    temp_file = f"{archive_file}.tmp"
+                    with open(os.path.join(log_dir, segment), 'rb') as src, gzip.open(temp_file, 'wb') as out:
+                        shutil.copyfileobj(src, out)
+                    os.replace(temp_file, archive_file)
+                    index[archive_segment] = index.pop(segment)
+                self._save_log_index(log_dir, index)
+                os.remove(os.path.join(log_dir, segment))
+    
+    # Family overview summaries: one JSON line per update in SUMMARY_FILE, last
+    # line per person wins. Only the bytes added since the last read are parsed.
+    
+    def save_summary(self, person, summary):
+        self.save_summaries({person: summary})
+    
+    def save_summaries(self, summaries):
+        content = "".join(json.dumps({'person': person, **summary}) + "\n" for person, summary in summaries.items())
+        with file_lock(self._path(SUMMARY_LOCK_FILE)):
+            with open(self._path(SUMMARY_FILE), 'a') as f:
+                f.write(content)
+    
+    def start_day(self, states):
+        """Move each person's saved state to the history and save their new day's state
+        
+        People whose saved state is missing or already from the new day are
+        skipped. Returns the people rolled over.
+        """
+        finished = {}
+        for person, state in states.items():
+            saved = self.load_state(person)
+            if saved is not None and saved.get('date', '') < state['date']:
+                finished[person] = saved
+        if not finished:
+            return []
+        
+        # History first, in one append: a crash before the new states are saved
+        # only means the same day is archived again next time
+        content = "".join(json.dumps({'person': person, **state}) + "\n" for person, state in finished.items())
+        with file_lock(self._path(STATE_HISTORY_LOCK_FILE)):
+            with open(self._path(STATE_HISTORY_FILE), 'a') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+        
+        for person in finished:
+            with file_lock(self._path(get_lock_file(person))):
+                saved_date = self.load_state_date(person)
+                if saved_date is not None and saved_date < states[person]['date']:
+                    self._write_json(self._path(get_checklist_file(person)), states[person], indent=2)
+        return list(finished)
+    
+    def iter_state_history(self, person):
+        """Yield the person's archived day states, oldest first; a re-archived day appears again"""
+        if not os.path.exists(self._path(STATE_HISTORY_FILE)):
+            return
+        with open(self._path(STATE_HISTORY_FILE), 'r') as f:
+            for line in f:
+                if line.strip():
+                    state = json.loads(line)
+                    if state.pop('person') == person:
+                        yield state
+    
+    def load_summaries(self):
+        """Return person -> latest summary for everyone with a saved summary"""
+        with self._summary_lock:
+            try:
+                file_stat = os.stat(self._path(SUMMARY_FILE))
+            except FileNotFoundError:
+                return {}
+            
+            if file_stat.st_ino != self._summary_inode or file_stat.st_size < self._summary_offset:
+                # Compacted or replaced since we last looked - start over
+                self._summary_inode = file_stat.st_ino
+                self._summary_offset = 0
+                self._summary_rows = 0
+                self._summaries = {}
+            
+            if file_stat.st_size > self._summary_offset:
+                with open(self._path(SUMMARY_FILE), 'rb') as f:
+                    f.seek(self._summary_offset)
+                    data = f.read()
+                # Leave a partially written last line for the next read
+                complete = data[:data.rfind(b"\n") + 1]
+                for line in complete.decode('utf-8').splitlines():
+                    if line.strip():
+                        summary = json.loads(line)
+                        self._summaries[summary.pop('person')] = summary
+                        self._summary_rows += 1
+                self._summary_offset += len(complete)
+            
+            if self._summary_rows > 4 * len(self._summaries) + 100:
+                self._compact_summaries()
+            return dict(self._summaries)
+    
+    def _compact_summaries(self):
+        """Rewrite the summary file with one line per person"""
+        with file_lock(self._path(SUMMARY_LOCK_FILE)):
+            # Pick up anything appended since the read that triggered this
+            with open(self._path(SUMMARY_FILE), 'rb') as f:
+                f.seek(self._summary_offset)
+                for line in f.read().decode('utf-8').splitlines():
+                    if line.strip():
+                        summary = json.loads(line)
+                        self._summaries[summary.pop('person')] = summary
+            
+            content = "".join(
+                json.dumps({'person': person, **summary}) + "\n"
+                for person, summary in self._summaries.items()
+            )
+            write_file_atomic(self._path(SUMMARY_FILE), content)
+            self._summary_inode = os.stat(self._path(SUMMARY_FILE)).st_ino
+            self._summary_offset = len(content.encode('utf-8'))
+            self._summary_rows = len(self._summaries)
+    
+    # Daily rollups: one JSON line per finished day in checklist_rollup_<person>.jsonl;
+    # the last line for a date wins and the file is compacted once lines pile up
+    
+    def save_rollup_days(self, person, rows):
+        content = "".join(json.dumps(row) + "\n" for row in rows)
+        with file_lock(self._path(get_lock_file(person))):
+            with open(self._path(get_rollup_file(person)), 'a') as f:
+                f.write(content)
+    
+    def load_rollup_days(self, person):
+        """Return date -> rollup row for every day saved for person"""
+        with file_lock(self._path(get_lock_file(person))):
+            rollup_file = self._path(get_rollup_file(person))
+            if not os.path.exists(rollup_file):
+                return {}
+            days = {}
+            lines = 0
+            with open(rollup_file, 'r') as f:
+                for line in f:
+                    if line.strip():
+                        row = json.loads(line)
+                        days[row['date']] = row
+                        lines += 1
+            if lines > 2 * len(days) + 100:
+                write_file_atomic(rollup_file, "".join(json.dumps(row) + "\n" for row in days.values()))
+        return days
+    
+    def replace_rollup_days(self, person, rows):
+        with file_lock(self._path(get_lock_file(person))):
+            write_file_atomic(self._path(get_rollup_file(person)), "".join(json.dumps(row) + "\n" for row in rows))
+    
+    def drop_rollup_days(self, person, start_date):
+        """Forget the rows from start_date on, so they are folded from the log again"""
+        with file_lock(self._path(get_lock_file(person))):
+            rollup_file = self._path(get_rollup_file(person))
+            if not os.path.exists(rollup_file):
+                return
+            with open(rollup_file, 'r') as f:
+                rows = [json.loads(line) for line in f if line.strip()]
+            write_file_atomic(rollup_file, "".join(json.dumps(row) + "\n" for row in rows if row['date'] < start_date))
+    
+    # Ticket redemptions: one JSON line each in checklist_redemptions_<person>.jsonl
+    
+    def append_redemption(self, person, redemption, check=None):
+        """Save a redemption; check(), if given, runs first under the person's lock and may raise to refuse it"""
+        with file_lock(self._path(get_lock_file(person))):
+            if check is not None:
+                check()
+            with open(self._path(get_redemption_file(person)), 'a') as f:
+                f.write(json.dumps(redemption) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+    
+    def iter_redemptions(self, person):
+        """Yield the person's redemptions, oldest first"""
+        yield from self.read_redemptions(person)[0]
+    
+    def read_redemptions(self, person, position=0):
+        """Return the person's redemptions saved after position, oldest first, and the position after them"""
+        try:
+            with open(self._path(get_redemption_file(person)), 'rb') as f:
+                f.seek(position)
+                data = f.read()
+        except FileNotFoundError:
+            return [], position
+        # Leave a partially written last line for the next read
+        complete = data[:data.rfind(b"\n") + 1]
+        redemptions = [json.loads(line) for line in complete.decode('utf-8').splitlines() if line.strip()]
+        return redemptions, position + len(complete)
+    
+    def iter_log(self, person, start_date=None, end_date=None):
+        """Yield log entries for a person, oldest first, reading only overlapping segments"""
+        self.migrate_legacy_log(person)
+        log_dir = self._path(get_log_dir(person))
+        index = self._load_log_index(person)
+        
+        segments = sorted(index.items(), key=lambda item: (item[1]['first_date'], item[0]))
+        for segment, info in segments:
+            if start_date and info['last_date'] < start_date:
+                continue
+            if end_date and info['first_date'] > end_date:
+                continue
+            segment_file = os.path.join(log_dir, segment)
+            if not os.path.exists(segment_file):
+                # Registered by an append whose lines are not written yet
+                continue
+            
+            for log_entry in iter_segment_entries(segment_file):
+                log_date = get_log_entry_date(log_entry)
+                if start_date and log_date < start_date:
+                    continue
+                if end_date and log_date > end_date:
+                    continue
+                yield log_entry
+
+class SqliteStorage:
+    """Checklist state and completion log kept in indexed SQLite tables"""
+    
+    name = "sqlite"
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS checklist_state (
+            person TEXT NOT NULL,
+            date TEXT NOT NULL,
+            task_key TEXT NOT NULL,
+            completed INTEGER NOT NULL,
+            completion_time TEXT,
+            PRIMARY KEY (person, task_key)
+        );
+        CREATE INDEX IF NOT EXISTS idx_state_person_date ON checklist_state (person, date);
+        CREATE TABLE IF NOT EXISTS completion_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            person TEXT NOT NULL,
+            date TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            task TEXT NOT NULL,
+            tickets INTEGER NOT NULL,
+            completed INTEGER NOT NULL,
+            task_key TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_log_person_date_task ON completion_log (person, date, task);
+        CREATE TABLE IF NOT EXISTS checklist_day (
+            person TEXT PRIMARY KEY,
+            date TEXT NOT NULL,
+            log_rows INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS person_summary (
+            person TEXT PRIMARY KEY,
+            summary TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS state_history (
+            person TEXT NOT NULL,
+            date TEXT NOT NULL,
+            state TEXT NOT NULL,
+            PRIMARY KEY (person, date)
+        );
+        CREATE TABLE IF NOT EXISTS daily_rollup (
+            person TEXT NOT NULL,
+            date TEXT NOT NULL,
+            row TEXT NOT NULL,
+            PRIMARY KEY (person, date)
+        );
+        CREATE TABLE IF NOT EXISTS redemption (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            person TEXT NOT NULL,
+            date TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            reward TEXT NOT NULL,
+            tickets INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_redemption_person ON redemption (person);
+    """
+    
+    def __init__(self, db_file, data_dir=""):
+        self.db_file = db_file
+        # Where the household's other files (archive, journals) live
+        self.data_dir = data_dir
+        self._local = threading.local()
+        conn = self._connect()
+        conn.executescript(self.SCHEMA)
+        # Databases created before log entries carried their task key
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(completion_log)")]
+        if 'task_key' not in columns:
+            conn.execute("ALTER TABLE completion_log ADD COLUMN task_key TEXT")
+    
+    def _connect(self):
+        # sqlite3 connections are bound to the thread that created them
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            import sqlite3
+            conn = sqlite3.connect(self.db_file, timeout=10)
+            # WAL lets other sessions keep reading while one of them writes
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+    
+    def load_state(self, person):
+        rows = self._connect().execute(
+            "SELECT date, task_key, completed, completion_time FROM checklist_state WHERE person = ?",
+            (person,)
+        ).fetchall()
+        if not rows:
+            return None
+        
+        state = {'date': rows[0][0], 'completed_tasks': {}, 'completion_times': {}}
+        for _, task_key, completed, completion_time in rows:
+            state['completed_tasks'][task_key] = bool(completed)
+            state['completion_times'][task_key] = completion_time
+        
+        day = self._connect().execute(
+            "SELECT log_rows FROM checklist_day WHERE person = ? AND date = ?", (person, state['date'])
+        ).fetchone()
+        if day is not None:
+            state['log_rows'] = day[0]
+        return state
+    
+    def load_state_date(self, person):
+        row = self._connect().execute(
+            "SELECT date FROM checklist_state WHERE person = ? LIMIT 1", (person,)
+        ).fetchone()
+        return row[0] if row is not None else None
+    
+    def _write_state(self, conn, person, state):
+        conn.execute("DELETE FROM checklist_state WHERE person = ?", (person,))
+        conn.executemany(
+            "INSERT INTO checklist_state VALUES (?, ?, ?, ?, ?)",
+            [
+                (person, state['date'], task_key, int(completed), state['completion_times'].get(task_key))
+                for task_key, completed in state['completed_tasks'].items()
+            ]
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO checklist_day VALUES (?, ?, ?)",
+            (person, state['date'], state.get('log_rows', 0))
+        )
+    
+    def save_state(self, person, state):
+        conn = self._connect()
+        with conn:
+            self._write_state(conn, person, state)
+    
+    def update_state(self, person, state, changes):
+        """Apply task changes on top of the saved state and return the merged state"""
+        conn = self._connect()
+        with conn:
+            # Take the write lock up front so the date check and the update are atomic
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT date FROM checklist_state WHERE person = ? LIMIT 1", (person,)
+            ).fetchone()
+            if row is None or row[0] != state['date']:
+                merged = copy_state(state)
+                for task_key, (completed, completion_time) in changes.items():
+                    merged['completed_tasks'][task_key] = completed
+                    merged['completion_times'][task_key] = completion_time
+                self._write_state(conn, person, merged)
+            else:
+                conn.executemany(
+                    "INSERT INTO checklist_state VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (person, task_key) DO UPDATE SET "
+                    "completed = excluded.completed, completion_time = excluded.completion_time",
+                    [
+                        (person, state['date'], task_key, int(completed), completion_time)
+                        for task_key, (completed, completion_time) in changes.items()
+                    ]
+                )
+        return self.load_state(person)
+    
+    def append_log(self, person, log_entry):
+        self.append_log_many(person, [log_entry])
+    
+    def append_log_many(self, person, log_entries):
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT INTO completion_log (person, date, timestamp, task, tickets, completed, task_key) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (log_entry['person'], log_entry['date'], log_entry['timestamp'],
+                     log_entry['task'], log_entry['tickets'], int(log_entry['completed']),
+                     log_entry.get('task_key'))
+                    for log_entry in log_entries
+                ]
+            )
+    
+    def save_summary(self, person, summary):
+        self.save_summaries({person: summary})
+    
+    def save_summaries(self, summaries):
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO person_summary VALUES (?, ?)",
+                [(person, json.dumps(summary)) for person, summary in summaries.items()]
+            )
+    
+    def start_day(self, states):
+        """Move each person's saved state to the history and save their new day's state, in one transaction"""
+        conn = self._connect()
+        finished = []
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for person, state in states.items():
+                saved = self.load_state(person)
+                if saved is None or saved['date'] >= state['date']:
+                    continue
+                conn.execute(
+                    "INSERT OR REPLACE INTO state_history VALUES (?, ?, ?)",
+                    (person, saved['date'], json.dumps(saved))
+                )
+                self._write_state(conn, person, state)
+                finished.append(person)
+        return finished
+    
+    def iter_state_history(self, person):
+        rows = self._connect().execute(
+            "SELECT state FROM state_history WHERE person = ? ORDER BY date", (person,)
+        )
+        for row in rows:
+            yield json.loads(row[0])
+    
+    def load_summaries(self):
+        rows = self._connect().execute("SELECT person, summary FROM person_summary").fetchall()
+        return {person: json.loads(summary) for person, summary in rows}
+    
+    def save_rollup_days(self, person, rows):
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO daily_rollup VALUES (?, ?, ?)",
+                [(person, row['date'], json.dumps(row)) for row in rows]
+            )
+    
+    def load_rollup_days(self, person):
+        rows = self._connect().execute("SELECT row FROM daily_rollup WHERE person = ?", (person,)).fetchall()
+        days = [json.loads(row[0]) for row in rows]
+        return {row['date']: row for row in days}
+    
+    def replace_rollup_days(self, person, rows):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM daily_rollup WHERE person = ?", (person,))
+            conn.executemany(
+                "INSERT INTO daily_rollup VALUES (?, ?, ?)",
+                [(person, row['date'], json.dumps(row)) for row in rows]
+            )
+    
+    def drop_rollup_days(self, person, start_date):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM daily_rollup WHERE person = ? AND date >= ?", (person, start_date))
+    
+    def append_redemption(self, person, redemption, check=None):
+        conn = self._connect()
+        with conn:
+            if check is not None:
+                # Holds the write lock, so no other redemption lands between the check and the insert
+                conn.execute("BEGIN IMMEDIATE")
+                check()
+            conn.execute(
+                "INSERT INTO redemption (person, date, timestamp, reward, tickets) VALUES (?, ?, ?, ?, ?)",
+                (person, redemption['date'], redemption['timestamp'], redemption['reward'], redemption['tickets'])
+            )
+    
+    def iter_redemptions(self, person):
+        yield from self.read_redemptions(person)[0]
+    
+    def read_redemptions(self, person, position=0):
+        rows = self._connect().execute(
+            "SELECT id, date, timestamp, reward, tickets FROM redemption WHERE person = ? AND id > ? ORDER BY id",
+            (person, position)
+        ).fetchall()
+        redemptions = [{'date': row[1], 'timestamp': row[2], 'reward': row[3], 'tickets': row[4]} for row in rows]
+        return redemptions, rows[-1][0] if rows else position
+    
+    def has_log(self, person):
+        row = self._connect().execute(
+            "SELECT 1 FROM completion_log WHERE person = ? LIMIT 1", (person,)
+        ).fetchone()
+        return row is not None
+    
+    def iter_log(self, person, start_date=None, end_date=None):
+        query = "SELECT person, date, timestamp, task, tickets, completed, task_key FROM completion_log WHERE person = ?"
+        params = [person]
+        if start_date:
+            query += " AND date >= ?"
+            params.append(start_date)
+        if end_date:
+            query += " AND date <= ?"
+            params.append(end_date)
+        cursor = self._connect().execute(query + " ORDER BY id", params)
+        for row in cursor:
+            yield {
+                'person': row[0],
+                'date': row[1],
+                'timestamp': row[2],
+                'task': row[3],
+                'tickets': row[4],
+                'completed': bool(row[5]),
+                'task_key': row[6]
+            }
+
+def open_storage(backend=STORAGE_BACKEND, data_dir=""):
+    """Open the storage backend over the files in data_dir"""
+    if backend == "sqlite":
+        if DATA_ROOT and os.path.isabs(SQLITE_DB_FILE):
+            raise ValueError(f"CHECKLIST_DB must be a relative path when CHECKLIST_DATA_ROOT is set, not {SQLITE_DB_FILE!r}")
+        return SqliteStorage(os.path.join(data_dir, SQLITE_DB_FILE), data_dir)
+    if backend == "json":
+        return JsonFileStorage(data_dir)
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+def get_storage(backend=STORAGE_BACKEND):
+    """Return the household's storage backend, shared by all of its sessions"""
+    household = get_household()
+    return household.get(f'storage_{backend}', lambda: open_storage(backend, household.data_dir))
+
+def import_json_files_to_sqlite(people, sqlite_storage):
+    """Copy existing JSON state and log files into the SQLite backend"""
+    json_storage = JsonFileStorage(sqlite_storage.data_dir)
+    imported = 0
+    for person in people:
+        state = json_storage.load_state(person)
+        if state is not None and sqlite_storage.load_state(person) is None:
+            sqlite_storage.save_state(person, state)
+            imported += 1
+        
+        # Skip people whose history was already imported, so this is safe to re-run
+        if not sqlite_storage.has_log(person):
+            log_entries = list(json_storage.iter_log(person))
+            if log_entries:
+                sqlite_storage.append_log_many(person, log_entries)
+                imported += 1
+        
+        if next(sqlite_storage.iter_redemptions(person), None) is None:
+            redemptions = list(json_storage.iter_redemptions(person))
+            for redemption in redemptions:
+                sqlite_storage.append_redemption(person, redemption)
+            imported += bool(redemptions)
+    return imported
+
+# Optional background writer: a toggle is acknowledged in memory and its log
+# entry, state change and summary are persisted afterwards by one thread
+ASYNC_WRITES = os.environ.get("CHECKLIST_ASYNC_WRITES", "0") == "1"
+WRITE_JOURNAL_PREFIX = "checklist_pending_writes_"
+WRITE_RETRIES = 3
+WRITE_RETRY_DELAY_SECONDS = 0.2
+
+def get_write_journal_file(pid, journal_dir="."):
+    return os.path.join(journal_dir, f"{WRITE_JOURNAL_PREFIX}{pid}.jsonl")
+
+class BackgroundWriter:
+    """Persists queued writes on a single thread, in the order they were submitted
+    
+    A write is a dict with the person and any of log_entries, state + changes,
+    snapshot and summary. Each one is appended to this process's journal and
+    fsynced before submit returns, and the journal is emptied whenever the queue
+    drains, so a crash of the process or the machine leaves every acknowledged
+    but unfinished write in the journal. Concurrent submits share one fsync.
+    The next writer to start replays journals whose process is gone: writes
+    land at least once, and log entries that already reached storage are not
+    appended twice.
+    """
+    
+    def __init__(self, storage, journal_dir="."):
+        self.storage = storage
+        self.journal_dir = journal_dir
+        self.journal_file = get_write_journal_file(os.getpid(), journal_dir)
+        self._queue = queue.Queue()
+        self._journal_lock = threading.Lock()
+        self._sync_cond = threading.Condition()
+        self._journaled = 0
+        self._synced = 0
+        self._syncing = False
+        self._failed = []
+        self._errors = {}
+        self._closed = False
+        
+        self.recover()
+        self._journal = os.open(self.journal_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        if fcntl is not None:
+            # Held for the writer's lifetime; recover() only claims unlocked journals
+            fcntl.flock(self._journal, fcntl.LOCK_EX)
+        self._thread = threading.Thread(target=self._run, name="checklist-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+    
+    def submit(self, write):
+        """Journal a write and queue it; returns once it is on disk, without waiting for storage"""
+        data = (json.dumps(write) + "\n").encode('utf-8')
+        with self._journal_lock:
+            if self._closed:
+                raise RuntimeError("The background writer has been closed")
+            os.write(self._journal, data)
+            self._journaled += 1
+            ticket = self._journaled
+            self._queue.put(write)
+        self._sync_journal(ticket)
+    
+    def _sync_journal(self, ticket):
+        # Like GroupCommitter: the first thread to arrive fsyncs every line
+        # written so far, and threads arriving meanwhile wait for the next fsync
+        with self._sync_cond:
+            while self._synced < ticket:
+                if self._syncing:
+                    self._sync_cond.wait()
+                    continue
+                if self._journal is None:
+                    return  # closed: the queue was drained into storage first
+                
+                self._syncing = True
+                with self._journal_lock:
+                    target = self._journaled
+                self._sync_cond.release()
+                try:
+                    os.fsync(self._journal)
+                finally:
+                    self._sync_cond.acquire()
+                    self._syncing = False
+                    self._sync_cond.notify_all()
+                self._synced = max(self._synced, target)
+    
+    def flush(self):
+        """Block until every write submitted so far has been attempted"""
+        self._queue.join()
+    
+    def take_errors(self, person):
+        """Return and forget the write errors not yet shown for person"""
+        with self._journal_lock:
+            return self._errors.pop(person, [])
+    
+    def close(self):
+        """Flush and stop the writer thread; writes that failed stay journaled"""
+        with self._journal_lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        with self._sync_cond:
+            self._sync_cond.wait_for(lambda: not self._syncing)
+            os.close(self._journal)
+            self._journal = None
+        if not self._failed:
+            os.remove(self.journal_file)
+    
+    def recover(self):
+        """Replay writes left in the journals of writers that are no longer running"""
+        replayed = 0
+        for name in sorted(os.listdir(self.journal_dir)):
+            path = os.path.join(self.journal_dir, name)
+            if not name.startswith(WRITE_JOURNAL_PREFIX):
+                continue
+            with open(path, 'r', encoding='utf-8') as f:
+                if fcntl is not None:
+                    try:
+                        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except OSError:
+                        continue  # its writer is still running
+                
+                failed = False
+                for line in f:
+                    try:
+                        write = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line: that write was never acknowledged
+                    try:
+                        self._write(write, set(), recovering=True)
+                        replayed += 1
+                    except Exception as e:
+                        failed = True
+                        self._report(write, e)
+                if not failed:
+                    os.remove(path)
+        return replayed
+    
+    def _run(self):
+        while True:
+            write = self._queue.get()
+            try:
+                if write is None:
+                    return
+                self._write_with_retries(write)
+                with self._journal_lock:
+                    if self._queue.empty():
+                        self._reset_journal()
+            finally:
+                self._queue.task_done()
+    
+    def _write_with_retries(self, write):
+        # Steps that succeeded are not repeated, so a retry never logs an entry twice
+        done = set()
+        for attempt in range(WRITE_RETRIES):
+            try:
+                self._write(write, done)
+                return
+            except Exception as e:
+                error = e
+                time.sleep(WRITE_RETRY_DELAY_SECONDS * 2 ** attempt)
+        self._failed.append(write)
+        self._report(write, error)
+    
+    def _write(self, write, done, recovering=False):
+        person = write['person']
+        if recovering:
+            # A replayed write must not overwrite a day that has started since
+            saved_date = self.storage.load_state_date(person)
+            stale = saved_date is not None and saved_date > write['date']
+        else:
+            stale = False
+        
+        if 'log' not in done and write.get('log_entries'):
+            log_entries = write['log_entries']
+            if recovering:
+                log_entries = self._not_logged(person, write['date'], log_entries)
+            if log_entries:
+                self.storage.append_log_many(person, log_entries)
+                if recovering and write['date'] < get_today_key():
+                    # The finished day's saved rollup row does not have these entries
+                    self.storage.drop_rollup_days(person, write['date'])
+            done.add('log')
+        if 'state' not in done and write.get('changes') and not stale:
+            self.storage.update_state(person, write['state'], write['changes'])
+            done.add('state')
+        if 'snapshot' not in done and write.get('snapshot') and not stale:
+            self.storage.save_state(person, write['snapshot'])
+            done.add('snapshot')
+        if 'summary' not in done and write.get('summary') and not stale:
+            self.storage.save_summary(person, write['summary'])
+            done.add('summary')
+    
+    def _not_logged(self, person, date, log_entries):
+        logged = {(entry.get('timestamp'), entry.get('task_key')) for entry in self.storage.iter_log(person, date, date)}
+        return [entry for entry in log_entries if (entry['timestamp'], entry['task_key']) not in logged]
+    
+    def _reset_journal(self):
+        # Only writes that ran out of retries are still owed
+        os.ftruncate(self._journal, 0)
+        if self._failed:
+            os.write(self._journal, "".join(json.dumps(write) + "\n" for write in self._failed).encode('utf-8'))
+    
+    def _report(self, write, error):
+        with self._journal_lock:
+            self._errors.setdefault(write['person'], []).append(str(error))
+
+def get_background_writer():
+    household = get_household()
+    return household.get('background_writer', lambda: BackgroundWriter(get_storage(), household.data_dir or "."))
+
+def flush_pending_writes():
+    """Wait for queued background writes to reach storage before reading or overwriting it"""
+    if ASYNC_WRITES:
+        get_background_writer().flush()
+
+def get_today_key():
+    """Get today's date as a string key"""
+    return datetime.now().strftime("%Y-%m-%d")
+
+@timed_phase("state_load")
+def load_checklist_state(person):
+    """Load checklist state from storage"""
+    # Toggles still queued from yesterday land before a new day is started
+    flush_pending_writes()
+    if EVENT_SOURCED_STATE:
+        return replay_checklist_state(person)
+    
+    try:
+        state = get_storage().load_state(person)
+    except:
+        return create_fresh_checklist(get_task_registry(person))
+    
+    # A missing state or one saved on an earlier day starts a fresh checklist
+    if state is None or state.get('date', '') != get_today_key():
+        return create_fresh_checklist(get_task_registry(person))
+    return state
+
+def create_fresh_checklist(registry=None):
+    """Create a fresh checklist for today"""
+    state = {
+        'date': get_today_key(),
+        'completed_tasks': {},
+        'completion_times': {}
+    }
+    
+    # Initialize all tasks as incomplete
+    for task in (registry or get_task_registry()).tasks:
+        state['completed_tasks'][task.key] = False
+        state['completion_times'][task.key] = None
+    
+    return state
+
+def replay_checklist_state(person):
+    """Rebuild today's state from the latest snapshot plus the day's remaining log events"""
+    flush_pending_writes()
+    return replay_day_state(get_storage(), person, get_task_registry(person), get_today_key())
+
+def replay_day_state(storage, person, registry, date):
+    """Rebuild the person's state on date from that day's snapshot plus the day's remaining log events"""
+    try:
+        snapshot = storage.load_state(person)
+    except:
+        snapshot = None
+    
+    if snapshot is None or snapshot.get('date', '') != date:
+        state = create_fresh_checklist(registry)
+        state['date'] = date
+    else:
+        state = snapshot
+    applied = state.get('log_rows', 0)
+    
+    log_rows = 0
+    for log_entry in storage.iter_log(person, date, date):
+        log_rows += 1
+        if log_rows <= applied:
+            continue
+        
+        task_key = log_entry.get('task_key')
+        if task_key is None and log_entry.get('task') in registry.name_to_id:
+            task_key = registry.tasks[registry.name_to_id[log_entry['task']]].key
+        if task_key is None:
+            continue
+        state['completed_tasks'][task_key] = log_entry['completed']
+        state['completion_times'][task_key] = log_entry['timestamp'] if log_entry['completed'] else None
+    
+    state['log_rows'] = log_rows
+    return state
+
+@timed_phase("state_save")
+def save_checklist_state(person, state):
+    """Save checklist state to storage and publish it to other sessions"""
+    try:
+        flush_pending_writes()
+        get_storage().save_state(person, state)
+        get_state_store().put(person, state)
+    except Exception as e:
+        st.error(f"Error saving checklist for {person}: {e}")
+
+@timed_phase("state_save")
+def update_checklist_state(person, state, changes):
+    """Persist task changes merged with the saved state; returns the merged state"""
+    try:
+        merged = get_storage().update_state(person, state, changes)
+        get_state_store().put(person, merged)
+        return merged
+    except Exception as e:
+        st.error(f"Error saving checklist for {person}: {e}")
+        return None
+
+def read_log_entries(person, start_date=None, end_date=None):
+    """Yield log entries for a person, oldest first, optionally within a date range"""
+    flush_pending_writes()
+    return get_storage().iter_log(person, start_date, end_date)
+
+def make_log_entry(person, task_key, task_name, tickets, completed, timestamp):
+    return {
+        'person': person,
+        'date': get_today_key(),
+        'timestamp': timestamp,
+        'task': task_name,
+        'tickets': tickets,
+        'completed': completed,
+        'task_key': task_key
+    }
+
+@timed_phase("log_append")
+def log_completion(person, task_key, task_name, tickets, completed, timestamp):
+    """Append a task completion entry to the log"""
+    try:
+        log_entry = make_log_entry(person, task_key, task_name, tickets, completed, timestamp)
+        flush_pending_writes()
+        get_daily_rollups().load(person, get_task_registry(person))
+        get_storage().append_log(person, log_entry)
+        fold_log_entries(person, [log_entry])
+            
+    except Exception as e:
+        st.error(f"Error logging completion for {person}: {e}")
+
+@timed_phase("log_append")
+def log_completions(person, log_entries):
+    """Append several task completion entries to the log in one write"""
+    try:
+        flush_pending_writes()
+        get_daily_rollups().load(person, get_task_registry(person))
+        get_storage().append_log_many(person, log_entries)
+        fold_log_entries(person, log_entries)
+    except Exception as e:
+        st.error(f"Error logging completion for {person}: {e}")
+
+def record_task_change(person, task, completed):
+    """Apply one checkbox change to the session and persist it"""
+    record_task_changes(person, [(task, completed, datetime.now().isoformat())])
+
+def record_task_changes(person, task_changes):
+    """Apply (task, completed, timestamp) changes in order and persist them as one batch
+    
+    All log entries go out in one append and the state in one save. Changes
+    that leave a task as it already is are dropped; returns how many were kept.
+    """
+    progress = st.session_state[f'checklist_progress_{person}']
+    changes = {}
+    log_entries = []
+    for task, completed, timestamp in task_changes:
+        if progress.is_done(task.task_id) == completed:
+            continue
+        progress.set(task.task_id, completed, timestamp)
+        changes[task.key] = (completed, timestamp if completed else None)
+        log_entries.append(make_log_entry(person, task.key, task.name, task.tickets, completed, timestamp))
+    if not log_entries:
+        return 0
+    
+    store = get_state_store()
+    seen_version = st.session_state.get(f'checklist_version_{person}')
+    if ASYNC_WRITES:
+        queue_task_changes(person, log_entries, changes)
+    else:
+        log_completions(person, log_entries)
+        
+        if not EVENT_SOURCED_STATE:
+            merged = update_checklist_state(person, progress.to_state(), changes)
+            if merged is not None:
+                merged_progress = ChecklistProgress.from_state(progress.registry, merged)
+                if merged_progress.done != progress.done:
+                    # Another session toggled tasks since this one loaded; pick those up too
+                    st.session_state[f'checklist_progress_{person}'] = merged_progress
+        else:
+            # The log entries alone are durable; snapshot now and then so replays stay short
+            logged = progress.log_rows or 0
+            progress.log_rows = logged + len(log_entries)
+            if progress.log_rows // STATE_SNAPSHOT_EVERY > logged // STATE_SNAPSHOT_EVERY:
+                snapshot_checklist_state(person)
+            elif store.apply(person, progress.date, changes, len(log_entries)) is None:
+                store.put(person, progress.to_state())
+        save_person_summary(person)
+    
+    # This session already has what it just wrote; if others wrote in between, refresh on the next run
+    if store.version(person) == (seen_version or 0) + 1:
+        st.session_state[f'checklist_version_{person}'] = store.version(person)
+    if progress.is_complete:
+        try:
+            queue_completion_email(person)
+        except Exception as e:
+            st.error(f"Error queueing the completion email for {person}: {e}")
+    return len(log_entries)
+
+def queue_task_changes(person, log_entries, changes):
+    """Acknowledge changes in the shared store and hand their writes to the background writer"""
+    progress = st.session_state[f'checklist_progress_{person}']
+    store = get_state_store()
+    if EVENT_SOURCED_STATE:
+        progress.log_rows = (progress.log_rows or 0) + len(log_entries)
+    entry = store.apply(person, progress.date, changes, len(log_entries))
+    if entry is None:
+        entry = store.put(person, progress.to_state())
+    
+    write = {
+        'person': person,
+        'date': progress.date,
+        'log_entries': log_entries,
+        'summary': summarize_progress(progress, progress.date)
+    }
+    fold_log_entries(person, log_entries)
+    if not EVENT_SOURCED_STATE:
+        write['state'] = progress.to_state()
+        write['changes'] = changes
+    elif entry[1]['log_rows'] // STATE_SNAPSHOT_EVERY > (entry[1]['log_rows'] - len(log_entries)) // STATE_SNAPSHOT_EVERY:
+        # Everything queued before this write is on disk by the time it runs
+        write['snapshot'] = entry[1]
+    try:
+        get_background_writer().submit(write)
+    except Exception as e:
+        st.error(f"Error saving checklist for {person}: {e}")
+
+def set_category_done(person, category, completed):
+    """Complete or clear every task in a category with one batched write"""
+    registry = get_checklist_progress(person).registry
+    timestamp = datetime.now().isoformat()
+    task_ids = dict(registry.categories).get(category, ())
+    return record_task_changes(person, [(registry.tasks[task_id], completed, timestamp) for task_id in task_ids])
+
+def apply_task_changes(person, task_changes):
+    """Apply task_key -> completed changes with one batched write; unknown keys are skipped"""
+    registry = get_checklist_progress(person).registry
+    timestamp = datetime.now().isoformat()
+    return record_task_changes(person, [
+        (registry.tasks[registry.key_to_id[task_key]], completed, timestamp)
+        for task_key, completed in task_changes.items()
+        if task_key in registry.key_to_id
+    ])
+
+def import_day_toggles(person, log_entries):
+    """Replay today's toggles logged on another device, oldest first, as one batched write
+    
+    Toggles already in this log, or older than this device's own latest toggle
+    of the same task, are skipped, so importing the same file twice is harmless.
+    """
+    registry = get_checklist_progress(person).registry
+    today = get_today_key()
+    logged = set()
+    latest = {}
+    for log_entry in read_log_entries(person, today, today):
+        logged.add((log_entry['timestamp'], log_entry['task']))
+        latest[log_entry['task']] = max(latest.get(log_entry['task'], ''), log_entry['timestamp'])
+    
+    task_changes = []
+    for log_entry in sorted(log_entries, key=lambda log_entry: log_entry['timestamp']):
+        task_id = registry.key_to_id.get(log_entry.get('task_key'), registry.name_to_id.get(log_entry['task']))
+        if log_entry['date'] != today or task_id is None:
+            continue
+        if (log_entry['timestamp'], log_entry['task']) in logged or log_entry['timestamp'] < latest.get(log_entry['task'], ''):
+            continue
+        task_changes.append((registry.tasks[task_id], log_entry['completed'], log_entry['timestamp']))
+    return record_task_changes(person, task_changes)
+
+def parse_log_csv(csv_file):
+    """Read log entries back from a CSV export"""
+    import csv
+    from io import TextIOWrapper
+    
+    return [
+        {**row, 'tickets': int(row['tickets']), 'completed': row['completed'] == 'True'}
+        for row in csv.DictReader(TextIOWrapper(csv_file, encoding='utf-8'))
+    ]
+
+def snapshot_checklist_state(person):
+    """Save a snapshot of today's state rebuilt from the log, covering every logged event"""
+    state = replay_checklist_state(person)
+    save_checklist_state(person, state)
+    if f'checklist_progress_{person}' in st.session_state:
+        set_checklist_state(person, state)
+    return state
+
+def reset_checklist(person):
+    """Clear today's checklist for a person with one batched write"""
+    # Un-tick through the log, so the ticket ledger takes the tickets back and
+    # replaying today's events in event-sourced mode does not undo the reset
+    registry = get_checklist_progress(person).registry
+    return apply_task_changes(person, {task.key: False for task in registry.tasks})
+
+def roll_over_day(people, storage, store, schema, rollups):
+    """Start a new day for everyone whose saved state is from an earlier day, as one batch
+    
+    Their final states go to the state history, fresh states and summaries
+    are saved, and every session reloads them on its next run, as do sessions
+    of people who were only looked at. Returns the people rolled over.
+    """
+    today = get_today_key()
+    if EVENT_SOURCED_STATE:
+        # The snapshot lags the log and is missing after a few toggles, so the
+        # last logged day is replayed into it to be archived whole
+        for person in people:
+            registry = schema.registry(person)
+            last_day = max((date for date in rollups.days(person, registry) if date < today), default=None)
+            saved_date = storage.load_state_date(person)
+            if last_day is not None and (saved_date is None or saved_date <= last_day):
+                storage.save_state(person, replay_day_state(storage, person, registry, last_day))
+    
+    fresh = {person: create_fresh_checklist(schema.registry(person)) for person in people}
+    rolled = storage.start_day(fresh)
+    if rolled:
+        storage.save_summaries({
+            person: summarize_progress(ChecklistProgress.from_state(schema.registry(person), fresh[person]), fresh[person]['date'])
+            for person in rolled
+        })
+        for person in rolled:
+            store.invalidate(person)
+    # People with nothing saved still have yesterday's fresh state in the store
+    store.invalidate_before(people, today)
+    return rolled
+
+def seconds_until_midnight():
+    now = datetime.now()
+    midnight = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return (midnight - now).total_seconds()
+
+class DayRollover:
+    """Rolls one household's people over to the new day, keeping the outcome of the last run for the sidebar"""
+    
+    def __init__(self, rollover, scheduler):
+        self._rollover = rollover
+        self._scheduler = scheduler
+        self._lock = threading.Lock()
+        self.people = []
+        self.day = None
+        self.last_run = None
+        self.last_rolled = []
+        self.last_error = None
+        self._scheduled = False
+    
+    def watch(self, people):
+        """Set who to roll over; the first call hands the household to the scheduler"""
+        with self._lock:
+            self.people = list(people)
+            first, self._scheduled = not self._scheduled, True
+        if first:
+            self._scheduler.add(self)
+    
+    def run_now(self):
+        """Roll over now; returns the people rolled over"""
+        with self._lock:
+            self.day = get_today_key()
+            try:
+                self.last_rolled = self._rollover(self.people)
+                self.last_error = None
+            except Exception as e:
+                self.last_rolled = []
+                self.last_error = str(e)
+            self.last_run = datetime.now()
+            return self.last_rolled
+
+class MidnightScheduler:
+    """One background thread that rolls every household over just after local midnight
+    
+    A household is also rolled over as soon as it is added, to catch up on a
+    midnight the server was down for.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._rollovers = []
+        self._thread = threading.Thread(target=self._run, name="checklist-midnight", daemon=True)
+    
+    def add(self, rollover):
+        """Roll rollover over from now on; the first call starts the thread"""
+        with self._lock:
+            self._rollovers.append(rollover)
+            if self._thread.ident is None:
+                self._thread.start()
+        self._wake.set()
+    
+    def _run(self):
+        while True:
+            self._wake.clear()
+            today = get_today_key()
+            with self._lock:
+                rollovers = list(self._rollovers)
+            for rollover in rollovers:
+                if rollover.day != today:
+                    rollover.run_now()
+            # Re-aim at least hourly in case the clock was changed
+            self._wake.wait(min(seconds_until_midnight() + 1, 3600))
+
+@st.cache_resource
+def get_midnight_scheduler():
+    return MidnightScheduler()
+
+def get_day_rollover():
+    return get_household().get('day_rollover', create_day_rollover)
+
+def create_day_rollover():
+    # The scheduler runs outside any script run, so it gets the household's objects up front
+    storage = get_storage()
+    store = get_state_store()
+    schema_loader = get_schema_loader()
+    rollups = get_daily_rollups()
+    ledger = get_ticket_ledger()
+    writer = get_background_writer() if ASYNC_WRITES else None
+    
+    def rollover(people):
+        if writer is not None:
+            # Yesterday's queued toggles land before yesterday is archived
+            writer.flush()
+        schema = schema_loader.get()
+        rolled = roll_over_day(people, storage, store, schema, rollups)
+        for person in rolled:
+            archive_log(person, storage)
+        for person in people:
+            # Finished days are saved with every process's toggles, and the ledger takes them up
+            rollups.seal(person, schema.registry(person))
+            ledger.invalidate(person)
+        return rolled
+    
+    return DayRollover(rollover, get_midnight_scheduler())
+
+# People listed per page in the family overview
+OVERVIEW_PAGE_SIZE = 10
+
+def summarize_progress(progress, date):
+    """The small per-person record the family overview is drawn from"""
+    return {
+        'date': date,
+        'completed': progress.completed_count,
+        'earned_tickets': progress.earned_tickets,
+        'total': progress.registry.total_tasks
+    }
+
+def save_person_summary(person):
+    """Record the session's current progress for the family overview"""
+    progress = st.session_state[f'checklist_progress_{person}']
+    try:
+        get_storage().save_summary(person, summarize_progress(progress, progress.date))
+    except Exception as e:
+        st.error(f"Error saving overview for {person}: {e}")
+
+def rebuild_family_summaries(people):
+    """Recompute every person's summary from their saved state"""
+    summaries = {}
+    for person in people:
+        state = load_checklist_state(person)
+        summaries[person] = summarize_progress(ChecklistProgress.from_state(get_task_registry(person), state), state['date'])
+    get_storage().save_summaries(summaries)
+    return summaries
+
+def load_family_summaries(people):
+    """Return person -> summary without loading anyone's full state"""
+    summaries = get_storage().load_summaries()
+    if not summaries and people:
+        # First run with summaries: backfill them once from the saved states
+        summaries = rebuild_family_summaries(people)
+    return summaries
+
+# Daily rollups behind the analytics page, kept up to date as entries are
+# logged so history views never scan the raw log
+class DailyRollups:
+    """Each person's daily rollup rows, shared by every session in the process
+    
+    A row is {'date', 'done': {task_key: tickets}, 'toggles', 'earned',
+    'reversed', 'total'}: the tasks that ended the day done, how many toggles
+    were logged, the tickets ticked and un-ticked over the day and how many
+    tasks the checklist had. Only finished days are saved. Today's row, and any
+    day not saved yet, is folded from the log when the person's rows are first
+    loaded, and new entries are then folded into the rows in memory. Processes
+    sharing a data directory therefore never overwrite each other's counts, and
+    a toggle costs no extra write.
+    """
+    
+    def __init__(self, storage):
+        self.storage = storage
+        self._lock = threading.Lock()
+        self._days = {}
+        # person -> date of the newest saved row
+        self._saved_through = {}
+    
+    def days(self, person, registry):
+        """Return date -> row for person; the rows must not be modified"""
+        with self._lock:
+            return dict(self._load(person, registry))
+    
+    def load(self, person, registry):
+        """Load the person's rows now, if they are not loaded yet
+        
+        Call it before appending entries the rows will be told about: rows
+        first built from a log that already holds them would count them twice.
+        """
+        with self._lock:
+            self._load(person, registry)
+    
+    def apply(self, person, log_entries, registry):
+        """Fold newly logged entries into their days' rows; returns the changed rows"""
+        with self._lock:
+            days = self._load(person, registry)
+            changed = self._fold(days, log_entries, registry)
+            days.update(changed)
+        return list(changed.values())
+    
+    def seal(self, person, registry):
+        """Save the person's finished days that are not saved yet, folded again from the log
+        
+        Called at rollover: the log has the entries other processes logged to
+        those days, where the rows in memory only have this process's. Does
+        nothing for a person whose rows are not loaded.
+        """
+        with self._lock:
+            days = self._days.get(person)
+            if days is None:
+                return
+            today = get_today_key()
+            folded = self._fold_unsaved(person, registry)
+            # Today's row keeps the entries of writes still queued in this process
+            days.update({date: row for date, row in folded.items() if date < today})
+    
+    def rebuild(self, person, registry):
+        """Recompute every row from the person's full log; returns the number of days"""
+        with self._lock:
+            days = self._fold({}, self.storage.iter_log(person), registry)
+            self._save_finished(person, days, replace=True)
+            self._days[person] = days
+        return len(days)
+    
+    def _load(self, person, registry):
+        days = self._days.get(person)
+        if days is None:
+            days = self.storage.load_rollup_days(person)
+            if any('earned' not in row for row in days.values()):
+                # Rows saved before they carried ticket totals are rebuilt once
+                self.storage.replace_rollup_days(person, [])
+                days = {}
+            self._saved_through[person] = max(days, default=None)
+            days.update(self._fold_unsaved(person, registry))
+            self._days[person] = days
+        return days
+    
+    def _fold_unsaved(self, person, registry):
+        """Fold the days after the newest saved row from the log and save the finished ones"""
+        saved_through = self._saved_through.get(person)
+        log_entries = self.storage.iter_log(person, saved_through)
+        if saved_through is not None:
+            log_entries = (log_entry for log_entry in log_entries if get_log_entry_date(log_entry) > saved_through)
+        days = self._fold({}, log_entries, registry)
+        self._save_finished(person, days)
+        return days
+    
+    def _save_finished(self, person, days, replace=False):
+        today = get_today_key()
+        finished = [row for date, row in sorted(days.items()) if date < today]
+        if replace:
+            self.storage.replace_rollup_days(person, finished)
+        elif finished:
+            self.storage.save_rollup_days(person, finished)
+        if finished or replace:
+            self._saved_through[person] = finished[-1]['date'] if finished else None
+    
+    @staticmethod
+    def _fold(days, log_entries, registry):
+        changed = {}
+        for log_entry in log_entries:
+            date = get_log_entry_date(log_entry)
+            row = changed.get(date)
+            if row is None:
+                old = days.get(date)
+                row = {'date': date, 'done': {}, 'toggles': 0, 'earned': 0, 'reversed': 0, 'total': registry.total_tasks}
+                if old is not None:
+                    row.update(old, done=dict(old['done']))
+                changed[date] = row
+            
+            row['toggles'] += 1
+            row['earned' if log_entry['completed'] else 'reversed'] += log_entry['tickets']
+            task_key = log_entry.get('task_key')
+            if task_key is None and log_entry.get('task') in registry.name_to_id:
+                task_key = registry.tasks[registry.name_to_id[log_entry['task']]].key
+            if task_key is None:
+                continue
+            if log_entry['completed']:
+                row['done'][task_key] = log_entry['tickets']
+            else:
+                row['done'].pop(task_key, None)
+        return changed
+
+def get_daily_rollups():
+    return get_household().get('daily_rollups', lambda: DailyRollups(get_storage()))
+
+def fold_log_entries(person, log_entries):
+    """Fold logged entries into the in-memory rollups and ticket ledger; returns the changed rollup rows"""
+    registry = get_task_registry(person)
+    rows = get_daily_rollups().apply(person, log_entries, registry)
+    get_ticket_ledger().apply(person, rows, registry)
+    return rows
+
+def rebuild_rollups(people):
+    """Recompute the daily rollups and ticket ledgers of the given people from their logs"""
+    flush_pending_writes()
+    days = 0
+    for person in people:
+        days += get_daily_rollups().rebuild(person, get_task_registry(person))
+        get_ticket_ledger().invalidate(person)
+    return days
+
+# Ticket ledger: tickets earned by ticking tasks, reversed by un-ticking them
+# and redeemed for rewards, kept as running totals by day
+
+class TicketAccount:
+    """One person's ticket flows per day with prefix sums over the days
+    
+    prefix[i] holds the (earned, reversed, redeemed) totals through the end of
+    dates[i], so a balance or a date-range total is one or two lookups. Days
+    arrive in date order almost always, which makes keeping prefix current O(1).
+    """
+    
+    def __init__(self):
+        self.dates = []
+        self.index = {}
+        self.flows = []
+        self.prefix = []
+        self.redemptions = []
+    
+    @classmethod
+    def from_history(cls, rows, redemptions):
+        """Build an account from rollup rows and redemptions in one pass"""
+        flows = {row['date']: [row['earned'], row['reversed'], 0] for row in rows}
+        for redemption in redemptions:
+            flows.setdefault(redemption['date'], [0, 0, 0])[2] += redemption['tickets']
+        
+        account = cls()
+        account.dates = sorted(flows)
+        account.index = {date: i for i, date in enumerate(account.dates)}
+        account.flows = [flows[date] for date in account.dates]
+        account.prefix = [None] * len(account.dates)
+        account.redemptions = list(redemptions)
+        if account.dates:
+            account._update_prefix(0)
+        return account
+    
+    def set_day(self, date, earned, reversed):
+        """Set the tickets earned and reversed on date"""
+        i = self._day_index(date)
+        self.flows[i][0] = earned
+        self.flows[i][1] = reversed
+        self._update_prefix(i)
+    
+    def add_redemption(self, redemption):
+        i = self._day_index(redemption['date'])
+        self.flows[i][2] += redemption['tickets']
+        self.redemptions.append(redemption)
+        self._update_prefix(i)
+    
+    def through(self, date):
+        """(earned, reversed, redeemed) totals through the end of date"""
+        i = self.index.get(date)
+        if i is None:
+            i = bisect_right(self.dates, date) - 1
+        return self.prefix[i] if i >= 0 else (0, 0, 0)
+    
+    def before(self, date):
+        """(earned, reversed, redeemed) totals up to the start of date"""
+        i = self.index.get(date)
+        if i is None:
+            i = bisect_left(self.dates, date)
+        return self.prefix[i - 1] if i > 0 else (0, 0, 0)
+    
+    @property
+    def totals(self):
+        return self.prefix[-1] if self.prefix else (0, 0, 0)
+    
+    @property
+    def balance(self):
+        earned, reversed, redeemed = self.totals
+        return earned - reversed - redeemed
+    
+    def _day_index(self, date):
+        i = self.index.get(date)
+        if i is not None:
+            return i
+        i = bisect_left(self.dates, date)
+        self.dates.insert(i, date)
+        self.flows.insert(i, [0, 0, 0])
+        self.prefix.insert(i, None)
+        for j in range(i, len(self.dates)):
+            self.index[self.dates[j]] = j
+        return i
+    
+    def _update_prefix(self, i):
+        earned, reversed, redeemed = self.prefix[i - 1] if i > 0 else (0, 0, 0)
+        for j in range(i, len(self.dates)):
+            flow = self.flows[j]
+            earned, reversed, redeemed = earned + flow[0], reversed + flow[1], redeemed + flow[2]
+            self.prefix[j] = (earned, reversed, redeemed)
+
+class TicketLedger:
+    """Each person's TicketAccount, shared by every session in the process
+    
+    Earned and reversed tickets come from the daily rollup rows, so the ledger
+    is rebuilt from the log whenever they are; redemptions are stored on their
+    own and re-read from where the last read stopped, so redemptions made by
+    other processes show up too.
+    
+    A balance can go negative: un-ticking a task, or resetting the checklist,
+    takes back its tickets even when they were already spent. The person then
+    owes those tickets and cannot redeem until the balance is positive again.
+    """
+    
+    def __init__(self, storage, rollups):
+        self.storage = storage
+        self.rollups = rollups
+        self._lock = threading.Lock()
+        self._accounts = {}
+        # person -> storage position after the last redemption read
+        self._positions = {}
+    
+    def balance(self, person, registry):
+        with self._lock:
+            return self._load(person, registry).balance
+    
+    def totals(self, person, registry):
+        """Lifetime {'earned', 'reversed', 'redeemed', 'balance'} for person"""
+        with self._lock:
+            account = self._load(person, registry)
+            earned, reversed, redeemed = account.totals
+        return {'earned': earned, 'reversed': reversed, 'redeemed': redeemed, 'balance': earned - reversed - redeemed}
+    
+    def between(self, person, start_date, end_date, registry):
+        """{'earned', 'reversed', 'redeemed', 'net'} from start_date to end_date inclusive"""
+        with self._lock:
+            account = self._load(person, registry)
+            end = account.through(end_date)
+            start = account.before(start_date)
+        earned, reversed, redeemed = (end[k] - start[k] for k in range(3))
+        return {'earned': earned, 'reversed': reversed, 'redeemed': redeemed, 'net': earned - reversed - redeemed}
+    
+    def redemptions(self, person, registry):
+        """The person's redemptions, oldest first; they must not be modified"""
+        with self._lock:
+            return list(self._load(person, registry).redemptions)
+    
+    def apply(self, person, rows, registry):
+        """Take the day totals of changed rollup rows"""
+        with self._lock:
+            account = self._load(person, registry)
+            for row in rows:
+                account.set_day(row['date'], row['earned'], row['reversed'])
+    
+    def redeem(self, person, reward, tickets, registry):
+        """Spend tickets on a reward; raises ValueError if the balance does not cover it"""
+        if tickets <= 0:
+            raise ValueError("Redeem at least one ticket")
+        redemption = {
+            'date': get_today_key(),
+            'timestamp': datetime.now().isoformat(),
+            'reward': reward,
+            'tickets': tickets
+        }
+        
+        with self._lock:
+            account = self._load(person, registry)
+            
+            def check():
+                # Under the person's lock: no other process can redeem between this and the append
+                self._read_redemptions(person, account)
+                if tickets > account.balance:
+                    raise ValueError(f"{person} has {account.balance} ticket(s), not {tickets}")
+            
+            self.storage.append_redemption(person, redemption, check=check)
+            self._read_redemptions(person, account)
+        return redemption
     
-    .completion-email-disabled {
-        background: #F5F5F5;
-        padding: 1.5rem;
-        border-radius: 15px;
-        margin-top: 2rem;
-        border: 2px solid #CCCCCC;
-        text-align: center;
-        opacity: 0.6;
-    }
+    def invalidate(self, person):
+        with self._lock:
+            self._accounts.pop(person, None)
+            self._positions.pop(person, None)
     
-    .sidebar-person-selector {
-        background: #E8F5E8;
-        padding: 1rem;
-        border-radius: 10px;
-        margin-bottom: 1rem;
-    }
-</style>
-""", unsafe_allow_html=True)
+    def _load(self, person, registry):
+        account = self._accounts.get(person)
+        if account is None:
+            redemptions, self._positions[person] = self.storage.read_redemptions(person)
+            account = TicketAccount.from_history(self.rollups.days(person, registry).values(), redemptions)
+            self._accounts[person] = account
+        else:
+            self._read_redemptions(person, account)
+        return account
+    
+    def _read_redemptions(self, person, account):
+        redemptions, self._positions[person] = self.storage.read_redemptions(person, self._positions[person])
+        for redemption in redemptions:
+            account.add_redemption(redemption)
 
-# Define people
-PEOPLE = ["Jonathan", "Anthony"]
+def get_ticket_ledger():
+    return get_household().get('ticket_ledger', lambda: TicketLedger(get_storage(), get_daily_rollups()))
 
-# File paths (will be person-specific)
-def get_checklist_file(person):
-    return f"checklist_state_{person.lower()}.json"
+# Analytics queries: vectorised pandas/NumPy over the rollup rows of a period
 
-def get_log_file(person):
-    return f"checklist_log_{person.lower()}.json"
+def get_period_days(start_date, end_date):
+    import pandas as pd
+    return pd.date_range(start_date, end_date, freq='D')
 
-# Define the checklist items with categories
-CHECKLIST_ITEMS = {
-    "Morning Routine": [
-        {"task": "Make Bed", "tickets": 1},
-        {"task": "Eat and Clean up", "tickets": 1},
-        {"task": "Dressed and sunscreen", "tickets": 2},
-        {"task": "Brush hair and teeth", "tickets": 1},
-    ],
-    "Daily Activities": [
-        {"task": "Pick up all clothes of floor", "tickets": 1},
-        {"task": "Read 20 minutes", "tickets": 4},
-        {"task": "Martial Arts Practice", "tickets": 0},  # Handwritten note
-        {"task": "Guitar 7 minutes", "tickets": 4},
-        {"task": "Math pages", "tickets": 3},
-        {"task": "Workbook pages", "tickets": 3},
-    ],
-    "Evening Routine": [
-        {"task": "Bath quickly", "tickets": 2},
-        {"task": "In bed before 9", "tickets": 1},
-    ],
-    "Chores": [
-        {"task": "Clean up toys", "tickets": 3},
-        {"task": "Feed animals", "tickets": 1},
-        {"task": "Fold laundry", "tickets": 2},
-        {"task": "Put away laundry", "tickets": 2},
-        {"task": "Vacuum", "tickets": 4},
-        {"task": "Empty dishwasher", "tickets": 4},
-        {"task": "Brush cats", "tickets": 2},
-        {"task": "Empty trash cans", "tickets": 2},
-        {"task": "Clean bathroom", "tickets": 10},
-    ],
-    "Behavior": [
-        {"task": "Be polite no fighting", "tickets": 3},
-        {"task": "Speak kind all day", "tickets": 3},
+def load_rollup_frame(people, start_date, end_date):
+    """Rollup rows of people between the dates, one DataFrame row per person and day"""
+    import pandas as pd
+    
+    rollups = get_daily_rollups()
+    records = [
+        (person, row['date'], len(row['done']), sum(row['done'].values()), row['total'])
+        for person in people
+        for row in rollups.days(person, get_task_registry(person)).values()
+        if start_date <= row['date'] <= end_date
     ]
-}
+    frame = pd.DataFrame.from_records(records, columns=['person', 'date', 'completed', 'tickets', 'total'])
+    frame['date'] = pd.to_datetime(frame['date'])
+    frame['rate'] = frame['completed'] / frame['total'].where(frame['total'] > 0)
+    return frame
 
-def get_today_key():
-    """Get today's date as a string key"""
-    return datetime.now().strftime("%Y-%m-%d")
+def pivot_by_day(frame, column, people, start_date, end_date):
+    """Days x people table of one rollup column; days without a row count as zero"""
+    import pandas as pd
+    
+    days = get_period_days(start_date, end_date)
+    if frame.empty:
+        return pd.DataFrame(0.0, index=days, columns=people)
+    table = frame.pivot_table(index='date', columns='person', values=column, aggfunc='sum')
+    return table.reindex(index=days, columns=people).fillna(0)
 
-def should_reset_checklist(person):
-    """Check if checklist should be reset (new day)"""
-    checklist_file = get_checklist_file(person)
-    if not os.path.exists(checklist_file):
-        return True
+def streak_lengths(flags):
+    """Current and longest runs of True down each column of a days x series array
     
-    try:
-        with open(checklist_file, 'r') as f:
-            data = json.load(f)
-        
-        last_date = data.get('date', '')
-        return last_date != get_today_key()
-    except:
-        return True
+    The current streak still counts through yesterday while today is not done.
+    """
+    import numpy as np
+    
+    flags = np.asarray(flags, dtype=bool)
+    if flags.ndim == 1:
+        flags = flags[:, None]
+    if not len(flags):
+        zeros = np.zeros(flags.shape[1], dtype=int)
+        return zeros, zeros
+    counts = np.cumsum(flags, axis=0)
+    # The count reached at each miss, carried forward, restarts the run after it
+    restarts = np.maximum.accumulate(np.where(flags, 0, counts), axis=0)
+    runs = counts - restarts
+    current = runs[-1] if len(runs) == 1 else np.where(flags[-1], runs[-1], runs[-2])
+    return current, runs.max(axis=0)
 
-def load_checklist_state(person):
-    """Load checklist state from file"""
-    if should_reset_checklist(person):
-        return create_fresh_checklist()
+def task_done_matrix(person, start_date, end_date):
+    """Days x tasks boolean array of which tasks ended each day of the period done"""
+    import numpy as np
     
-    try:
-        checklist_file = get_checklist_file(person)
-        with open(checklist_file, 'r') as f:
-            return json.load(f)
-    except:
-        return create_fresh_checklist()
+    registry = get_task_registry(person)
+    days = get_period_days(start_date, end_date)
+    day_index = {day.strftime("%Y-%m-%d"): i for i, day in enumerate(days)}
+    matrix = np.zeros((len(days), registry.total_tasks), dtype=bool)
+    for date, row in get_daily_rollups().days(person, registry).items():
+        if date in day_index:
+            task_ids = [registry.key_to_id[task_key] for task_key in row['done'] if task_key in registry.key_to_id]
+            matrix[day_index[date], task_ids] = True
+    return matrix
 
-def create_fresh_checklist():
-    """Create a fresh checklist for today"""
-    state = {
-        'date': get_today_key(),
-        'completed_tasks': {},
-        'completion_times': {}
-    }
+# Column order of the CSV exports
+LOG_CSV_COLUMNS = ['person', 'date', 'timestamp', 'task', 'tickets', 'completed']
+
+# Rows buffered in memory before a chunk is written out
+CSV_CHUNK_ROWS = 1000
+
+def iter_log_csv_chunks(log_entries, chunk_rows=CSV_CHUNK_ROWS):
+    """Yield CSV text in chunks of at most chunk_rows rows, header first"""
+    import csv
+    from io import StringIO
     
-    # Initialize all tasks as incomplete
-    for category, tasks in CHECKLIST_ITEMS.items():
-        for task in tasks:
-            task_key = f"{category}_{task['task']}"
-            state['completed_tasks'][task_key] = False
-            state['completion_times'][task_key] = None
+    buffer = StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=LOG_CSV_COLUMNS, extrasaction='ignore', lineterminator='\n')
+    writer.writeheader()
     
-    return state
+    rows = 0
+    for log_entry in log_entries:
+        writer.writerow(log_entry)
+        rows += 1
+        if rows % chunk_rows == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    
+    if buffer.tell():
+        yield buffer.getvalue()
 
-def save_checklist_state(person, state):
-    """Save checklist state to file"""
-    try:
-        checklist_file = get_checklist_file(person)
-        with open(checklist_file, 'w') as f:
-            json.dump(state, f, indent=2)
-    except Exception as e:
-        st.error(f"Error saving checklist for {person}: {e}")
+def iter_combined_log_entries(people, start_date=None, end_date=None):
+    """K-way merge of each person's log by timestamp, without concatenating them"""
+    person_logs = [sort_log_days(read_log_entries(person, start_date, end_date)) for person in people]
+    return heapq.merge(*person_logs, key=lambda log_entry: log_entry.get('timestamp', ''))
 
-def log_completion(person, task_key, task_name, tickets, completed, timestamp):
-    """Log task completion to log file"""
-    try:
-        log_file = get_log_file(person)
-        # Load existing log
-        if os.path.exists(log_file):
-            with open(log_file, 'r') as f:
-                log_data = json.load(f)
-        else:
-            log_data = []
-        
-        # Add new entry
-        log_entry = {
-            'person': person,
-            'date': get_today_key(),
-            'timestamp': timestamp,
-            'task': task_name,
-            'tickets': tickets,
-            'completed': completed
-        }
-        
-        log_data.append(log_entry)
-        
-        # Save log
-        with open(log_file, 'w') as f:
-            json.dump(log_data, f, indent=2)
-            
-    except Exception as e:
-        st.error(f"Error logging completion for {person}: {e}")
+def sort_log_days(log_entries):
+    """Yield one person's log entries in timestamp order, sorting one day at a time
+    
+    A log is in day order, but toggles imported from another device are
+    appended after later ones of the same day, which heapq.merge cannot fix.
+    """
+    for _, day_entries in groupby(log_entries, key=lambda log_entry: log_entry['date']):
+        yield from sorted(day_entries, key=lambda log_entry: log_entry.get('timestamp', ''))
+
+def spool_log_csv(log_entries):
+    """Stream log entries into a temporary CSV file; returns (file, row count)"""
+    row_count = 0
+    
+    def counted(entries):
+        nonlocal row_count
+        for log_entry in entries:
+            row_count += 1
+            yield log_entry
+    
+    # Chunks go straight to disk, so memory stays bounded however long the history is.
+    # Unbuffered, because st.download_button accepts raw file objects
+    csv_file = tempfile.TemporaryFile(buffering=0)
+    for chunk in iter_log_csv_chunks(counted(log_entries)):
+        csv_file.write(chunk.encode('utf-8'))
+    csv_file.seek(0)
+    return csv_file, row_count
 
-def generate_log_csv(person):
-    """Generate CSV content for download"""
+@timed_phase("csv_export")
+def generate_log_csv(person, start_date=None, end_date=None):
+    """Generate a CSV file for download, or a message string if there is nothing to export"""
     try:
-        log_file = get_log_file(person)
-        if not os.path.exists(log_file):
-            return "No log data available"
-        
-        with open(log_file, 'r') as f:
-            log_data = json.load(f)
-        
-        if not log_data:
+        log_entries = read_log_entries(person, start_date, end_date)
+        csv_file, row_count = spool_log_csv(log_entries)
+        if not row_count:
+            csv_file.close()
             return "No log data available"
         
-        df = pd.DataFrame(log_data)
-        return df.to_csv(index=False)
+        return csv_file
     
     except Exception as e:
         return f"Error generating log: {e}"
 
 def create_email_body(person):
     """Create email body for completion notification"""
-    state_key = f'checklist_state_{person}'
-    state = st.session_state[state_key]
-    
-    total_tasks = sum(len(tasks) for tasks in CHECKLIST_ITEMS.values())
-    total_tickets = sum(task['tickets'] for tasks in CHECKLIST_ITEMS.values() for task in tasks)
+    registry = get_task_registry(person)
+    total_tasks = registry.total_tasks
+    total_tickets = registry.total_tickets
     
     email_body = f"""Hi!
 
@@ -279,11 +2896,12 @@ def create_email_body(person):
 ✅ Completed Tasks:
 """
     
-    for category, tasks in CHECKLIST_ITEMS.items():
+    for category, task_ids in registry.categories:
         email_body += f"\n{category}:\n"
-        for task in tasks:
-            tickets_text = f" ({task['tickets']} tickets)" if task['tickets'] > 0 else ""
-            email_body += f"  ✓ {task['task']}{tickets_text}\n"
+        for task_id in task_ids:
+            task = registry.tasks[task_id]
+            tickets_text = f" ({task.tickets} tickets)" if task.tickets > 0 else ""
+            email_body += f"  ✓ {task.name}{tickets_text}\n"
     
     email_body += f"""
 Great job {person}! 🌟
@@ -305,65 +2923,487 @@ def create_mailto_link(person, subject, body):
     mailto_link = f"mailto:?subject={encoded_subject}&body={encoded_body}"
     return mailto_link
 
-def is_checklist_complete(person):
-    """Check if all tasks are completed for a person"""
-    state_key = f'checklist_state_{person}'
-    if state_key not in st.session_state:
+# Completion emails: with CHECKLIST_SMTP_HOST and recipients set (see
+# get_email_recipients), finishing a checklist queues one email per person and
+# day for delivery
+SMTP_HOST = os.environ.get("CHECKLIST_SMTP_HOST", "")
+SMTP_PORT = int(os.environ.get("CHECKLIST_SMTP_PORT", "25"))
+SMTP_USER = os.environ.get("CHECKLIST_SMTP_USER", "")
+SMTP_PASSWORD = os.environ.get("CHECKLIST_SMTP_PASSWORD", "")
+SMTP_STARTTLS = os.environ.get("CHECKLIST_SMTP_STARTTLS", "0") == "1"
+EMAIL_FROM = os.environ.get("CHECKLIST_EMAIL_FROM", "checklist@localhost")
+EMAIL_TO = [address.strip() for address in os.environ.get("CHECKLIST_EMAIL_TO", "").split(",") if address.strip()]
+OUTBOX_DIR = "checklist_outbox"
+EMAIL_RETRIES = 5
+EMAIL_RETRY_DELAY_SECONDS = 2
+# The pooled SMTP connection is closed after this long without mail
+SMTP_IDLE_SECONDS = 60
+
+def get_email_recipients():
+    """The household's completion email recipients: the config's email_to, else CHECKLIST_EMAIL_TO
+    
+    Households under a data root only have their own list, so one family's
+    emails never go to another's parents.
+    """
+    email_to = get_schema_loader().get().email_to
+    if email_to is not None:
+        return list(email_to)
+    return [] if DATA_ROOT else EMAIL_TO
+
+def email_enabled():
+    return bool(SMTP_HOST and get_email_recipients())
+
+# Names the "<date> <person>" whose CSV log the outbox worker attaches at delivery
+COMPLETION_LOG_HEADER = "X-Checklist-Log"
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def get_completion_email(household_id, person, date, config_signature):
+    """Subject and body of a completion email
+    
+    household_id and config_signature are only part of the cache key: people
+    in different households may share a name, and an edited config changes the
+    task list in the body.
+    """
+    subject = f"{person}'s Daily Checklist Complete - {date}"
+    return subject, create_email_body(person)
+
+def queue_completion_email(person):
+    """Queue today's completion email for person, once per day; returns whether it was queued"""
+    if not email_enabled():
         return False
+    from email.message import EmailMessage
     
-    state = st.session_state[state_key]
+    date = get_today_key()
+    key = f"{date}_{person.lower()}"
+    outbox = get_email_outbox()
+    if outbox.has(key):
+        return False
     
-    for category, tasks in CHECKLIST_ITEMS.items():
-        for task in tasks:
-            task_key = f"{category}_{task['task']}"
-            if not state['completed_tasks'].get(task_key, False):
+    subject, body = get_completion_email(get_household().household_id, person, date, get_schema_loader().get().signature)
+    message = EmailMessage()
+    message['Subject'] = subject
+    message['From'] = EMAIL_FROM
+    message['To'] = ", ".join(get_email_recipients())
+    # The log is attached by the outbox worker, so the click never waits for queued writes
+    message[COMPLETION_LOG_HEADER] = f"{date} {person}"
+    message.set_content(body)
+    return outbox.enqueue(key, message)
+
+class EmailOutbox:
+    """One household's queue of emails, delivered by the process-wide OutboxWorker
+    
+    Each message is saved as <key>.eml in the outbox directory before it is
+    queued and moved to sent/ once delivered, so a key is only ever queued
+    once and undelivered mail survives a restart. read_log(person, date)
+    yields the log entries attached to messages with a COMPLETION_LOG_HEADER.
+    """
+    
+    def __init__(self, worker, outbox_dir=OUTBOX_DIR, read_log=None):
+        self.worker = worker
+        self.outbox_dir = outbox_dir
+        self.read_log = read_log
+        self.sent_dir = os.path.join(outbox_dir, "sent")
+        os.makedirs(self.sent_dir, exist_ok=True)
+        
+        self.sent = 0
+        self.last_error = None
+        self._cond = threading.Condition()
+        self._queued = set()
+        worker.add(self)
+    
+    def has(self, key):
+        """Whether mail under key was ever queued"""
+        return (os.path.exists(os.path.join(self.outbox_dir, f"{key}.eml"))
+                or os.path.exists(os.path.join(self.sent_dir, f"{key}.eml")))
+    
+    def is_sent(self, key):
+        return os.path.exists(os.path.join(self.sent_dir, f"{key}.eml"))
+    
+    def enqueue(self, key, message):
+        """Save and queue message under key unless that key was queued before"""
+        with self._cond:
+            if self.has(key):
                 return False
+            write_file_atomic(os.path.join(self.outbox_dir, f"{key}.eml"), message.as_string())
+            self._queue(key)
+        return True
+    
+    def flush(self):
+        """Block until every message queued here so far has been attempted"""
+        with self._cond:
+            self._cond.wait_for(lambda: not self._queued)
+    
+    def requeue_pending(self):
+        """Queue the saved messages that are neither sent nor queued"""
+        with self._cond:
+            for name in sorted(os.listdir(self.outbox_dir)):
+                key = name[:-len(".eml")]
+                if name.endswith(".eml") and key not in self._queued:
+                    self._queue(key)
+    
+    def attach_log(self, message):
+        """Replace the message's COMPLETION_LOG_HEADER with the CSV log it names"""
+        log = message[COMPLETION_LOG_HEADER]
+        if log is None:
+            return
+        date, person = str(log).split(" ", 1)
+        log_entries = list(self.read_log(person, date)) if self.read_log is not None else []
+        del message[COMPLETION_LOG_HEADER]
+        if log_entries:
+            csv_text = "".join(iter_log_csv_chunks(log_entries))
+            message.add_attachment(csv_text.encode('utf-8'), maintype='text', subtype='csv',
+                                   filename=f"{person.lower()}_checklist_complete_{date}.csv")
+    
+    def attempted(self, key):
+        with self._cond:
+            self._queued.discard(key)
+            self._cond.notify_all()
+    
+    def _queue(self, key):
+        self._queued.add(key)
+        self.worker.put(self, key)
+
+class OutboxWorker:
+    """Delivers every household's queued emails on one background thread over one reused SMTP connection
+    
+    Failed sends are retried with exponential backoff; mail that still fails
+    is retried when the worker next goes idle.
+    """
+    
+    def __init__(self, host, port, user="", password="", starttls=False):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._outboxes = []
+        self._queue = queue.Queue()
+        self._smtp = None
+        self._last_used = 0
+        self._thread = threading.Thread(target=self._run, name="checklist-outbox", daemon=True)
+        self._thread.start()
+    
+    def add(self, outbox):
+        """Deliver outbox's mail from now on, starting with what it has left over"""
+        with self._lock:
+            self._outboxes.append(outbox)
+        outbox.requeue_pending()
+    
+    def put(self, outbox, key):
+        self._queue.put((outbox, key))
+    
+    def _run(self):
+        while True:
+            try:
+                outbox, key = self._queue.get(timeout=SMTP_IDLE_SECONDS)
+            except queue.Empty:
+                self._disconnect()
+                with self._lock:
+                    outboxes = list(self._outboxes)
+                for outbox in outboxes:
+                    outbox.requeue_pending()
+                continue
+            try:
+                self._deliver(outbox, key)
+            except Exception as e:
+                # One bad message must not stop the worker; it is retried when the worker next goes idle
+                outbox.last_error = f"{key}: {e}"
+            finally:
+                outbox.attempted(key)
+    
+    def _deliver(self, outbox, key):
+        import email
+        import email.policy
+        import smtplib
+        
+        path = os.path.join(outbox.outbox_dir, f"{key}.eml")
+        try:
+            with open(path, 'r') as f:
+                message = email.message_from_file(f, policy=email.policy.default)
+        except FileNotFoundError:
+            # Another process sharing the outbox has sent it already
+            return
+        outbox.attach_log(message)
+        for attempt in range(EMAIL_RETRIES):
+            try:
+                self._connection().send_message(message)
+            except (smtplib.SMTPException, OSError) as e:
+                outbox.last_error = f"{key}: {e}"
+                self._disconnect()
+                time.sleep(min(EMAIL_RETRY_DELAY_SECONDS * 2 ** attempt, 300))
+                continue
+            self._last_used = time.monotonic()
+            try:
+                os.replace(path, os.path.join(outbox.sent_dir, f"{key}.eml"))
+            except FileNotFoundError:
+                pass  # moved to sent/ by another process in the meantime
+            outbox.sent += 1
+            outbox.last_error = None
+            return
+    
+    def _connection(self):
+        import smtplib
+        
+        if self._smtp is not None and time.monotonic() - self._last_used > SMTP_IDLE_SECONDS / 2:
+            # The server may have dropped a connection that sat idle
+            try:
+                self._smtp.noop()
+            except (smtplib.SMTPException, OSError):
+                self._smtp = None
+        if self._smtp is None:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=30)
+            if self.starttls:
+                smtp.starttls()
+            if self.user:
+                smtp.login(self.user, self.password)
+            self._smtp = smtp
+            self.connections += 1
+        return self._smtp
+    
+    def _disconnect(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                pass
+            self._smtp = None
+
+@st.cache_resource
+def get_outbox_worker():
+    return OutboxWorker(SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASSWORD, SMTP_STARTTLS)
+
+def get_email_outbox():
+    household = get_household()
+    
+    def open_outbox():
+        storage = get_storage()
+        writer = get_background_writer() if ASYNC_WRITES else None
+        
+        def read_log(person, date):
+            # Runs on the worker's thread, so only the worker waits for queued writes
+            if writer is not None:
+                writer.flush()
+            return storage.iter_log(person, date, date)
+        
+        return EmailOutbox(get_outbox_worker(), household.path(OUTBOX_DIR), read_log)
     
-    return True
+    return household.get('email_outbox', open_outbox)
 
-def generate_combined_log_csv():
-    """Generate combined CSV for all people"""
+@timed_phase("csv_export")
+def generate_combined_log_csv(people=None, start_date=None, end_date=None):
+    """Generate combined CSV for all (or the given) people, ordered by timestamp"""
     try:
-        all_data = []
-        for person in PEOPLE:
-            log_file = get_log_file(person)
-            if os.path.exists(log_file):
-                with open(log_file, 'r') as f:
-                    person_data = json.load(f)
-                    all_data.extend(person_data)
-        
-        if not all_data:
+        log_entries = iter_combined_log_entries(get_people() if people is None else people, start_date, end_date)
+        csv_file, row_count = spool_log_csv(log_entries)
+        if not row_count:
+            csv_file.close()
             return "No log data available"
         
-        df = pd.DataFrame(all_data)
-        return df.to_csv(index=False)
+        return csv_file
     
     except Exception as e:
         return f"Error generating combined log: {e}"
 
-def render_checklist_for_person(person):
+# Columnar archive: each person's finished days as typed Parquet files, one per
+# month, in checklist_archive/<person>/ of the household. The log stays the source of truth;
+# archive_log() copies days into the archive once they are over.
+ARCHIVE_DIR = "checklist_archive"
+ARCHIVE_MANIFEST_FILE = "manifest.json"
+
+def get_archive_dir(person, data_dir=""):
+    return os.path.join(data_dir, ARCHIVE_DIR, person.lower())
+
+def get_archive_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ('person', pa.dictionary(pa.int32(), pa.string())),
+        ('date', pa.date32()),
+        ('timestamp', pa.timestamp('us')),
+        ('task', pa.dictionary(pa.int32(), pa.string())),
+        ('tickets', pa.int16()),
+        ('completed', pa.bool_())
+    ])
+
+def log_entries_to_table(log_entries):
+    """Build a typed Arrow table from log entries"""
+    import pyarrow as pa
+    
+    people, dates, timestamps, tasks, tickets, completed = [], [], [], [], [], []
+    for log_entry in log_entries:
+        people.append(log_entry['person'])
+        dates.append(datetime.strptime(log_entry['date'], "%Y-%m-%d").date())
+        timestamps.append(datetime.fromisoformat(log_entry['timestamp']))
+        tasks.append(log_entry['task'])
+        tickets.append(log_entry['tickets'])
+        completed.append(log_entry['completed'])
+    
+    return pa.Table.from_arrays([
+        pa.array(people, pa.string()).dictionary_encode(),
+        pa.array(dates, pa.date32()),
+        pa.array(timestamps, pa.timestamp('us')),
+        pa.array(tasks, pa.string()).dictionary_encode(),
+        pa.array(tickets, pa.int16()),
+        pa.array(completed, pa.bool_())
+    ], schema=get_archive_schema())
+
+def archive_log(person, storage=None):
+    """Copy the person's finished days from the log into their archive; returns rows added"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    archive_dir = get_archive_dir(person, (get_storage() if storage is None else storage).data_dir)
+    os.makedirs(archive_dir, exist_ok=True)
+    yesterday = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
+    with file_lock(os.path.join(archive_dir, "archive.lock")):
+        manifest_file = os.path.join(archive_dir, ARCHIVE_MANIFEST_FILE)
+        manifest = {}
+        if os.path.exists(manifest_file):
+            with open(manifest_file, 'r') as f:
+                manifest = json.load(f)
+        
+        archived_through = manifest.get('archived_through')
+        if archived_through is not None and archived_through >= yesterday:
+            return 0
+        start_date = None
+        if archived_through is not None:
+            start_date = (datetime.strptime(archived_through, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+        
+        entries_by_month = {}
+        log_entries = read_log_entries(person, start_date, yesterday) if storage is None else storage.iter_log(person, start_date, yesterday)
+        for log_entry in log_entries:
+            entries_by_month.setdefault(log_entry['date'][:7], []).append(log_entry)
+        
+        rows = 0
+        for month, log_entries in sorted(entries_by_month.items()):
+            table = log_entries_to_table(log_entries)
+            rows += table.num_rows
+            month_file = os.path.join(archive_dir, f"{month}.parquet")
+            if os.path.exists(month_file):
+                table = pa.concat_tables([pq.read_table(month_file, memory_map=True), table])
+            temp_file = f"{month_file}.tmp"
+            pq.write_table(table, temp_file, compression='zstd')
+            os.replace(temp_file, month_file)
+        
+        manifest['archived_through'] = yesterday
+        manifest['rows'] = manifest.get('rows', 0) + rows
+        write_file_atomic(manifest_file, json.dumps(manifest, indent=2))
+    return rows
+
+def read_archive(person, start_date=None, end_date=None):
+    """Memory-map the person's archived months overlapping the range into one table"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+    
+    archive_dir = get_archive_dir(person, get_storage().data_dir)
+    tables = []
+    if os.path.isdir(archive_dir):
+        for name in sorted(os.listdir(archive_dir)):
+            month = name[:7]
+            if not name.endswith(".parquet"):
+                continue
+            if (start_date and month < start_date[:7]) or (end_date and month > end_date[:7]):
+                continue
+            tables.append(pq.read_table(os.path.join(archive_dir, name), memory_map=True))
+    table = pa.concat_tables(tables) if tables else get_archive_schema().empty_table()
+    
+    if start_date:
+        table = table.filter(pc.field('date') >= datetime.strptime(start_date, "%Y-%m-%d").date())
+    if end_date:
+        table = table.filter(pc.field('date') <= datetime.strptime(end_date, "%Y-%m-%d").date())
+    return table
+
+@timed_phase("parquet_export")
+def generate_log_parquet(people, start_date=None, end_date=None):
+    """Generate a Parquet file of the people's history, archived days plus today, ordered by timestamp"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        today = get_today_key()
+        tables = []
+        for person in people:
+            archive_log(person)
+            tables.append(read_archive(person, start_date, end_date))
+            # Today is only in the log until it is over
+            if (start_date is None or start_date <= today) and (end_date is None or end_date >= today):
+                tables.append(log_entries_to_table(read_log_entries(person, today, today)))
+        table = pa.concat_tables(tables) if tables else get_archive_schema().empty_table()
+        if not table.num_rows:
+            return "No log data available"
+        
+        parquet_file = tempfile.TemporaryFile(buffering=0)
+        pq.write_table(table.sort_by('timestamp'), parquet_file, compression='zstd')
+        parquet_file.seek(0)
+        return parquet_file
+    
+    except Exception as e:
+        return f"Error generating archive: {e}"
+
+def get_date_range_filter(date_range):
+    """Turn a st.date_input range selection into (start_date, end_date) keys"""
+    if not date_range:
+        return None, None
+    start_date = date_range[0].strftime("%Y-%m-%d")
+    end_date = date_range[-1].strftime("%Y-%m-%d")
+    return start_date, end_date
+
+def render_overview_metric(slot, person, completed_tasks, total_tasks):
+    """Draw one person's family overview metric into a sidebar placeholder"""
+    completion_rate = (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
+    
+    # Add completion status emoji
+    status_emoji = "🎉" if total_tasks > 0 and completed_tasks == total_tasks else "📝"
+    slot.metric(f"{status_emoji} {person}", f"{completed_tasks}/{total_tasks}", f"{completion_rate:.1f}%")
+
+def on_task_toggled(person, task_key):
+    """Checkbox callback: record the change before the checklist re-renders"""
+    progress = get_checklist_progress(person)
+    # By key, as the config may have been reloaded since the checkbox was drawn
+    task_id = progress.registry.key_to_id.get(task_key)
+    if task_id is None:
+        return
+    task = progress.registry.tasks[task_id]
+    completed = st.session_state[f"checkbox_{person}_{task_key}"]
+    if completed != progress.is_done(task_id):
+        record_task_change(person, task, completed)
+
+def render_checklist_for_person(person, overview_slots=None):
     """Render the checklist interface for a specific person"""
     
     # Person header
     st.markdown(f'<div class="person-header">📋 {person}\'s Checklist</div>', unsafe_allow_html=True)
     
-    # Get or initialize session state for this person
-    state_key = f'checklist_state_{person}'
-    if state_key not in st.session_state:
-        st.session_state[state_key] = load_checklist_state(person)
-    
     # Display current date
     current_date = datetime.now().strftime("%A, %B %d, %Y")
     st.markdown(f"<h4 style='text-align: center; color: #666;'>{current_date}</h4>", unsafe_allow_html=True)
     
-    # Calculate statistics
-    total_tasks = sum(len(tasks) for tasks in CHECKLIST_ITEMS.values())
-    total_tickets = sum(task['tickets'] for tasks in CHECKLIST_ITEMS.values() for task in tasks)
-    completed_tasks = sum(1 for completed in st.session_state[state_key]['completed_tasks'].values() if completed)
-    earned_tickets = sum(
-        task['tickets'] for category, tasks in CHECKLIST_ITEMS.items() 
-        for task in tasks if st.session_state[state_key]['completed_tasks'].get(f"{category}_{task['task']}", False)
-    )
+    render_checklist_body(person, overview_slots or {})
+    
+    # Download section for this person
+    render_download_section(person)
+
+@fragment
+@timed_phase("render")
+def render_checklist_body(person, overview_slots):
+    """Stats, task rows and completion section; a checkbox click re-runs only this"""
+    if ASYNC_WRITES:
+        for error in get_background_writer().take_errors(person):
+            st.error(f"Error saving checklist for {person}: {error}")
+    
+    # Get or initialize session state for this person
+    with phase_timer("stats"):
+        progress = get_checklist_progress(person)
+        registry = progress.registry
+        
+        # Calculate statistics
+        total_tasks = registry.total_tasks
+        total_tickets = registry.total_tickets
+        completed_tasks = progress.completed_count
+        earned_tickets = progress.earned_tickets
     
     # Stats display
     col1, col2, col3, col4 = st.columns(4)
@@ -382,59 +3422,62 @@ def render_checklist_for_person(person):
     st.progress(completion_rate / 100)
     
     # Checklist sections
-    for category, tasks in CHECKLIST_ITEMS.items():
+    for category, task_ids in registry.categories:
         st.markdown(f'<div class="category-header">{category}</div>', unsafe_allow_html=True)
         
-        for task in tasks:
-            task_key = f"{category}_{task['task']}"
+        col1, col2, _ = st.columns([0.2, 0.2, 0.6])
+        with col1:
+            st.button("✅ Complete all", key=f"complete_all_{person}_{category}",
+                      on_click=set_category_done, args=(person, category, True))
+        with col2:
+            st.button("↩️ Clear all", key=f"clear_all_{person}_{category}",
+                      on_click=set_category_done, args=(person, category, False))
+        
+        for task_id in task_ids:
+            task = registry.tasks[task_id]
             
             col1, col2 = st.columns([0.8, 0.2])
             
             with col1:
                 # Create checkbox with unique key for this person
-                checkbox_key = f"checkbox_{person}_{task_key}"
-                current_state = st.session_state[state_key]['completed_tasks'].get(task_key, False)
-                new_state = st.checkbox(
-                    task['task'],
-                    value=current_state,
-                    key=checkbox_key
+                checkbox_key = f"checkbox_{person}_{task.key}"
+                # Keep the widget in step with state changed elsewhere (reset, other devices)
+                if st.session_state.get(checkbox_key) != progress.is_done(task_id):
+                    st.session_state[checkbox_key] = progress.is_done(task_id)
+                st.checkbox(
+                    task.name,
+                    key=checkbox_key,
+                    on_change=on_task_toggled,
+                    args=(person, task.key)
                 )
-                
-                # Handle state change
-                if new_state != current_state:
-                    st.session_state[state_key]['completed_tasks'][task_key] = new_state
-                    timestamp = datetime.now().isoformat()
-                    st.session_state[state_key]['completion_times'][task_key] = timestamp if new_state else None
-                    
-                    # Log the change
-                    log_completion(person, task_key, task['task'], task['tickets'], new_state, timestamp)
-                    
-                    # Save state
-                    save_checklist_state(person, st.session_state[state_key])
-                    
-                    # Rerun to update display
-                    st.rerun()
             
             with col2:
-                if task['tickets'] > 0:
-                    ticket_text = "🎫" * task['tickets']
-                    st.markdown(f'<div class="ticket-info">{ticket_text} ({task["tickets"]} tickets)</div>', 
+                if task.tickets > 0:
+                    ticket_text = "🎫" * task.tickets
+                    st.markdown(f'<div class="ticket-info">{ticket_text} ({task.tickets} tickets)</div>', 
                               unsafe_allow_html=True)
     
     # Completion Email Section - Only show if all tasks are complete
-    is_complete = is_checklist_complete(person)
+    is_complete = progress.is_complete
     
     if is_complete:
         st.markdown('<div class="completion-email-section">', unsafe_allow_html=True)
         st.markdown("### 🎉 CHECKLIST COMPLETE! 🎉")
         st.markdown(f"**{person}** has finished all tasks!")
         
-        # Create email content
-        email_subject = f"{person}'s Daily Checklist Complete - {get_today_key()}"
-        email_body = create_email_body(person)
+        # Built once per person and day, not on every rerun
+        today = get_today_key()
+        email_subject, email_body = get_completion_email(get_household().household_id, person, today, get_schema_loader().get().signature)
         
-        # Create download for CSV to attach manually
-        csv_content = generate_log_csv(person)
+        if email_enabled():
+            outbox = get_email_outbox()
+            email_key = f"{today}_{person.lower()}"
+            if outbox.is_sent(email_key):
+                st.success(f"📤 Completion email sent to {', '.join(get_email_recipients())}")
+            elif outbox.has(email_key):
+                st.info("📤 Completion email queued for delivery")
+                if outbox.last_error:
+                    st.warning(f"Delivery is being retried: {outbox.last_error}")
         
         col1, col2 = st.columns([1, 1])
         
@@ -462,16 +3505,20 @@ def render_checklist_for_person(person):
             st.markdown("*Opens your default email app*")
         
         with col2:
-            # Download CSV for manual attachment
-            if csv_content != "No log data available" and not csv_content.startswith("Error"):
-                st.download_button(
-                    label="📎 Download Log for Attachment",
-                    data=csv_content,
-                    file_name=f"{person.lower()}_checklist_complete_{get_today_key()}.csv",
-                    mime="text/csv",
-                    key=f"completion_download_{person}"
-                )
-                st.markdown("*Download this to attach to your email*")
+            # Download CSV for manual attachment, read only when asked for
+            if st.button("📎 Prepare Log for Attachment", key=f"completion_log_{person}"):
+                csv_content = generate_log_csv(person, today, today)
+                if not isinstance(csv_content, str):
+                    st.download_button(
+                        label="📎 Download Log for Attachment",
+                        data=csv_content,
+                        file_name=f"{person.lower()}_checklist_complete_{today}.csv",
+                        mime="text/csv",
+                        key=f"completion_download_{person}"
+                    )
+                    st.markdown("*Download this to attach to your email*")
+                else:
+                    st.warning(csv_content)
             
         st.markdown("**Instructions:**")
         st.markdown("1. Click '📧 Send Completion Email' to open your email app")
@@ -483,7 +3530,7 @@ def render_checklist_for_person(person):
     
     else:
         # Show grayed out section when incomplete
-        incomplete_count = sum(len(tasks) for tasks in CHECKLIST_ITEMS.values()) - sum(1 for completed in st.session_state[f'checklist_state_{person}']['completed_tasks'].values() if completed)
+        incomplete_count = progress.remaining
         
         st.markdown('<div class="completion-email-disabled">', unsafe_allow_html=True)
         st.markdown("### 📧 Completion Email")
@@ -509,16 +3556,77 @@ def render_checklist_for_person(person):
         st.markdown("*Complete all tasks to unlock the completion email*")
         st.markdown('</div>', unsafe_allow_html=True)
 
-    # Download section for this person
+    render_ticket_bank(person)
+    
+    # Keep this person's sidebar metric current without re-running the sidebar
+    if person in overview_slots:
+        render_overview_metric(overview_slots[person], person, progress.completed_count, registry.total_tasks)
+
+def on_redeem_submitted(person):
+    """Redeem form callback: spend the tickets before the balance is drawn again"""
+    reward = st.session_state[f"redeem_reward_{person}"].strip()
+    tickets = int(st.session_state[f"redeem_tickets_{person}"])
+    try:
+        if not reward:
+            raise ValueError("Name the reward to redeem tickets for.")
+        get_ticket_ledger().redeem(person, reward, tickets, get_task_registry(person))
+        message = ('success', f"🎁 Redeemed {tickets} ticket(s) for {reward}")
+    except ValueError as e:
+        message = ('error', str(e))
+    except Exception as e:
+        message = ('error', f"Error redeeming tickets for {person}: {e}")
+    # Drawn by render_ticket_bank(); a callback cannot draw inside the fragment
+    st.session_state[f"redeem_message_{person}"] = message
+
+def render_ticket_bank(person):
+    """Lifetime ticket balance, this week's tickets and the redemption form"""
+    registry = get_task_registry(person)
+    ledger = get_ticket_ledger()
+    totals = ledger.totals(person, registry)
+    week_start = (datetime.now() - timedelta(days=datetime.now().weekday())).strftime("%Y-%m-%d")
+    week = ledger.between(person, week_start, get_today_key(), registry)
+    
+    st.markdown("### 🏦 Ticket Bank")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Balance", totals['balance'])
+    with col2:
+        st.metric("Earned This Week", week['earned'] - week['reversed'])
+    with col3:
+        st.metric("Redeemed", totals['redeemed'])
+    if totals['balance'] < 0:
+        st.caption(f"🎫 {person} un-ticked tasks whose tickets were already spent and owes {-totals['balance']} ticket(s) before the next reward.")
+    
+    with st.form(key=f"redeem_{person}", clear_on_submit=True):
+        col1, col2 = st.columns([0.7, 0.3])
+        with col1:
+            st.text_input("Reward", key=f"redeem_reward_{person}", placeholder="Screen time, treat, outing...")
+        with col2:
+            st.number_input("Tickets", min_value=1, step=1, key=f"redeem_tickets_{person}")
+        st.form_submit_button("🎁 Redeem", on_click=on_redeem_submitted, args=(person,))
+    message = st.session_state.pop(f"redeem_message_{person}", None)
+    if message is not None:
+        getattr(st, message[0])(message[1])
+    
+    redemptions = ledger.redemptions(person, registry)
+    if redemptions:
+        st.markdown("**Recent rewards**")
+        for redemption in reversed(redemptions[-5:]):
+            st.markdown(f"- {redemption['date']}: {redemption['reward']} (🎫 {redemption['tickets']})")
+
+def render_download_section(person):
+    """Log download and reset buttons for a person"""
     st.markdown('<div class="download-section">', unsafe_allow_html=True)
     st.markdown(f"### 📥 Download {person}'s Log")
     
     col1, col2 = st.columns([1, 1])
     
     with col1:
+        date_range = st.date_input("Date range (optional)", value=(), key=f"log_range_{person}")
         if st.button(f"📊 Generate {person}'s Log", key=f"download_{person}"):
-            csv_content = generate_log_csv(person)
-            if csv_content != "No log data available" and not csv_content.startswith("Error"):
+            start_date, end_date = get_date_range_filter(date_range)
+            csv_content = generate_log_csv(person, start_date, end_date)
+            if not isinstance(csv_content, str):
                 st.download_button(
                     label=f"Download {person}'s CSV Log",
                     data=csv_content,
@@ -528,67 +3636,173 @@ def render_checklist_for_person(person):
                 )
             else:
                 st.warning(csv_content)
+        
+        if st.button(f"📦 Generate {person}'s Parquet Archive", key=f"archive_{person}"):
+            start_date, end_date = get_date_range_filter(date_range)
+            parquet_content = generate_log_parquet([person], start_date, end_date)
+            if not isinstance(parquet_content, str):
+                st.download_button(
+                    label=f"Download {person}'s Parquet Archive",
+                    data=parquet_content,
+                    file_name=f"checklist_log_{person.lower()}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.parquet",
+                    mime="application/vnd.apache.parquet",
+                    key=f"archive_btn_{person}"
+                )
+            else:
+                st.warning(parquet_content)
     
     with col2:
         if st.button(f"🔄 Reset {person}'s Checklist", key=f"reset_{person}"):
-            st.session_state[state_key] = create_fresh_checklist()
-            save_checklist_state(person, st.session_state[state_key])
+            reset_checklist(person)
             st.success(f"{person}'s checklist reset successfully!")
             st.rerun()
     
+    # Toggles made today on another device, from its CSV log download
+    upload = st.file_uploader(f"Import {person}'s toggles from another device", type="csv", key=f"import_file_{person}")
+    if upload is not None and st.button("📲 Import Toggles", key=f"import_{person}"):
+        try:
+            imported = import_day_toggles(person, parse_log_csv(upload))
+        except (KeyError, ValueError) as e:
+            st.error(f"Could not read {upload.name}: {e}")
+        else:
+            st.success(f"Imported {imported} toggle(s) for {person}.")
+            st.rerun()
+    
     st.markdown('</div>', unsafe_allow_html=True)
 
+# Periods offered on the analytics page, in days
+ANALYTICS_PERIODS = [7, 28, 91, 365]
+
+def render_analytics_page(selected_person):
+    """History views drawn from the daily rollups"""
+    import pandas as pd
+    
+    st.markdown('<div class="person-header">📈 Analytics</div>', unsafe_allow_html=True)
+    
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        people = st.multiselect("People", get_people(), default=[selected_person], key="analytics_people")
+    with col2:
+        period = st.selectbox("Period", ANALYTICS_PERIODS, index=1, key="analytics_period",
+                              format_func=lambda days: f"Last {days} days")
+    if not people:
+        st.info("Pick at least one person.")
+        return
+    
+    end_date = get_today_key()
+    start_date = (datetime.now() - timedelta(days=period - 1)).strftime("%Y-%m-%d")
+    frame = load_rollup_frame(people, start_date, end_date)
+    tickets = pivot_by_day(frame, 'tickets', people, start_date, end_date)
+    rates = pivot_by_day(frame, 'rate', people, start_date, end_date)
+    
+    st.markdown("### 🎫 Tickets per Day")
+    st.bar_chart(tickets)
+    st.markdown("### 🗓️ Tickets per Week")
+    st.bar_chart(tickets.resample('W-SUN').sum())
+    
+    st.markdown("### 📈 Completion Rate (7-day average)")
+    st.line_chart(rates.rolling(7, min_periods=1).mean() * 100)
+    
+    st.markdown("### 🔥 Full-Day Streaks")
+    current, longest = streak_lengths(rates.to_numpy() >= 1)
+    ledger = get_ticket_ledger()
+    st.dataframe(pd.DataFrame({
+        'Current streak': current,
+        'Longest streak': longest,
+        'Days complete': (rates.to_numpy() >= 1).sum(axis=0),
+        'Tickets': tickets.sum(axis=0).astype(int).to_numpy(),
+        'Redeemed': [ledger.between(person, start_date, end_date, get_task_registry(person))['redeemed'] for person in people],
+        'Balance': [ledger.balance(person, get_task_registry(person)) for person in people]
+    }, index=pd.Index(people, name='Person')))
+    
+    st.markdown("### ✅ Per-Task Consistency")
+    task_person = st.selectbox("Person", people, key="analytics_task_person") if len(people) > 1 else people[0]
+    registry = get_task_registry(task_person)
+    matrix = task_done_matrix(task_person, start_date, end_date)
+    current, longest = streak_lengths(matrix)
+    consistency = pd.DataFrame({
+        'Category': [task.category for task in registry.tasks],
+        'Task': [task.name for task in registry.tasks],
+        'Days done %': (matrix.mean(axis=0) * 100).round(1),
+        'Current streak': current,
+        'Longest streak': longest
+    })
+    st.dataframe(consistency.sort_values('Days done %', ascending=False), hide_index=True)
+    
+    if st.button("🔁 Rebuild Rollups from Log", key="rebuild_rollups"):
+        days = rebuild_rollups(people)
+        st.success(f"Rebuilt {days} day(s) of rollups.")
+        st.rerun()
+
 # Main app
 def main():
+    household_id = select_household()
+    if household_id is None:
+        return
+    schema_loader = get_schema_loader()
+    people = schema_loader.get().people
+    day_rollover = get_day_rollover()
+    day_rollover.watch(people)
+    
     # Header
     st.markdown('<div class="main-header">👨‍👦‍👦 Family Daily Checklist</div>', unsafe_allow_html=True)
+    if schema_loader.last_error:
+        st.error(f"Checklist config not reloaded, still using the previous one: {schema_loader.last_error}")
     
     # Sidebar for person selection
     with st.sidebar:
+        if DATA_ROOT:
+            st.caption(f"🏠 Household: {household_id}")
+            if get_login_email() is not None:
+                st.button("Log out", on_click=st.logout)
         st.markdown('<div class="sidebar-person-selector">', unsafe_allow_html=True)
         st.markdown("### 👥 Select Person")
         selected_person = st.selectbox(
             "Choose a family member:",
-            PEOPLE,
+            people,
             key="person_selector"
         )
+        evict_other_people(selected_person)
+        view = st.radio("View", ["✅ Checklist", "📈 Analytics"], key="view", horizontal=True)
         st.markdown('</div>', unsafe_allow_html=True)
         
         # Family overview
         st.markdown("### 📊 Family Overview")
         
-        family_stats = {}
-        for person in PEOPLE:
-            state_key = f'checklist_state_{person}'
-            if state_key not in st.session_state:
-                st.session_state[state_key] = load_checklist_state(person)
-            
-            total_tasks = sum(len(tasks) for tasks in CHECKLIST_ITEMS.values())
-            completed_tasks = sum(1 for completed in st.session_state[state_key]['completed_tasks'].values() if completed)
-            completion_rate = (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
-            
-            # Add completion status emoji
-            status_emoji = "🎉" if is_checklist_complete(person) else "📝"
-            
-            family_stats[person] = {
-                'completed': completed_tasks,
-                'total': total_tasks,
-                'rate': completion_rate,
-                'emoji': status_emoji
-            }
+        # Drawn from the per-person summaries; only the selected person's state is loaded
+        summaries = load_family_summaries(people)
+        today = get_today_key()
         
-        for person, stats in family_stats.items():
-            st.metric(
-                f"{stats['emoji']} {person}",
-                f"{stats['completed']}/{stats['total']}",
-                f"{stats['rate']:.1f}%"
-            )
+        def completed_today(person):
+            if person == selected_person:
+                return get_checklist_progress(person).completed_count
+            summary = summaries.get(person)
+            return summary['completed'] if summary is not None and summary['date'] == today else 0
+        
+        if len(people) > OVERVIEW_PAGE_SIZE:
+            finished = sum(1 for person in people if completed_today(person) == get_task_registry(person).total_tasks)
+            st.caption(f"🎉 {finished} of {len(people)} finished today")
+            search = st.text_input("Search", key="overview_search", placeholder="Name")
+            matches = [person for person in people if search.strip().lower() in person.lower()]
+            page_count = max(1, -(-len(matches) // OVERVIEW_PAGE_SIZE))
+            page = st.selectbox("Page", range(1, page_count + 1), key="overview_page") if page_count > 1 else 1
+            page_people = matches[(page - 1) * OVERVIEW_PAGE_SIZE:page * OVERVIEW_PAGE_SIZE]
+        else:
+            page_people = people
+        
+        overview_slots = {}
+        for person in page_people:
+            overview_slots[person] = st.empty()
+            render_overview_metric(overview_slots[person], person, completed_today(person), get_task_registry(person).total_tasks)
         
         # Combined download
         st.markdown("### 📥 Combined Reports")
+        report_people = st.multiselect("People", people, default=people, key="combined_people")
+        report_range = st.date_input("Date range (optional)", value=(), key="combined_range")
         if st.button("📊 Generate Combined Log"):
-            csv_content = generate_combined_log_csv()
-            if csv_content != "No log data available" and not csv_content.startswith("Error"):
+            start_date, end_date = get_date_range_filter(report_range)
+            csv_content = generate_combined_log_csv(report_people, start_date, end_date)
+            if not isinstance(csv_content, str):
                 st.download_button(
                     label="Download Combined Family Log",
                     data=csv_content,
@@ -597,26 +3811,56 @@ def main():
                 )
             else:
                 st.warning(csv_content)
+        if st.button("📦 Generate Combined Archive"):
+            start_date, end_date = get_date_range_filter(report_range)
+            parquet_content = generate_log_parquet(report_people, start_date, end_date)
+            if not isinstance(parquet_content, str):
+                st.download_button(
+                    label="Download Combined Parquet Archive",
+                    data=parquet_content,
+                    file_name=f"family_checklist_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.parquet",
+                    mime="application/vnd.apache.parquet"
+                )
+            else:
+                st.warning(parquet_content)
         
-        # Auto-refresh check
+        # One-off import of the JSON files when switching to the SQLite backend
+        storage = get_storage()
+        if storage.name == "sqlite":
+            st.markdown("### 💾 Storage")
+            if st.button("📦 Import JSON Files"):
+                try:
+                    imported = import_json_files_to_sqlite(people, storage)
+                    for person in people:
+                        get_state_store().invalidate(person)
+                    rebuild_family_summaries(people)
+                    st.success(f"Imported {imported} file(s) into {storage.db_file}.")
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"Error importing JSON files: {e}")
+
+        # Rollover normally happens in the background at midnight
         st.markdown("### 🔄 Daily Reset")
+        if day_rollover.last_error:
+            st.error(f"Last rollover failed: {day_rollover.last_error}")
+        elif day_rollover.last_run is not None:
+            st.caption(f"Last checked {day_rollover.last_run.strftime('%Y-%m-%d %H:%M')}; next rollover at midnight.")
         if st.button("🔄 Check for New Day"):
-            reset_count = 0
-            for person in PEOPLE:
-                if should_reset_checklist(person):
-                    state_key = f'checklist_state_{person}'
-                    st.session_state[state_key] = create_fresh_checklist()
-                    save_checklist_state(person, st.session_state[state_key])
-                    reset_count += 1
+            reset_count = len(day_rollover.run_now())
             
             if reset_count > 0:
                 st.success(f"New day detected! Reset {reset_count} checklist(s).")
                 st.rerun()
             else:
                 st.info("Still the same day - no reset needed.")
+        
+        render_debug_panel()
     
-    # Main content area - show selected person's checklist
-    render_checklist_for_person(selected_person)
+    # Main content area - show selected person's checklist, or the history views
+    if view == "📈 Analytics":
+        render_analytics_page(selected_person)
+    else:
+        render_checklist_for_person(selected_person, overview_slots)
 
 if __name__ == "__main__":
     main()